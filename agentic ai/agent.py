@@ -1,20 +1,44 @@
 import tools
 
 class Agent:
-    def __init__(self):
+    def __init__(self, doc_ids=None):
+        # Documents to retrieve from; None searches the whole corpus
+        self.doc_ids = doc_ids
         self.context = ""
 
-    def run(self, goal: str) -> dict:
+    def run(self, goal: str, render=None, whole_document: bool = False) -> dict:
+        """Runs the pipeline for `goal`.
+
+        With `whole_document` the summary covers every chunk of the
+        documents instead of the top-k retrieved for `goal`; it is built by
+        map-reduce so it stays within the model's context.
+
+        If given, `render(section, token_stream, stats)` is called for the
+        summary and the actions so they can be shown while they are
+        generated; it must consume the stream and return the full text.
+        `stats` then holds the LLM call's timing, or is empty if the text
+        came from the response cache.
+        """
         # Step 1: Retrieve context
-        self.context = tools.retrieve_context(goal)
+        if whole_document:
+            context = tools.document_chunks(self.doc_ids)
+            self.context = "\n".join(context)
+        else:
+            context = self.context = tools.retrieve_context(goal, doc_ids=self.doc_ids)
 
         # Step 2: Summarize
-        summary = tools.summarize(self.context)
+        summary = self._generate("summary", tools.summarize, context, render)
 
         # Step 3: Extract actionable insights
-        actions = tools.extract_action_items(summary)
+        actions = self._generate("actions", tools.extract_action_items, summary, render)
 
         return {
             "summary": summary,
             "actions": actions
         }
+
+    def _generate(self, section, step, text, render):
+        if render is None:
+            return step(text)
+        stats = {}
+        return render(section, step(text, stream=True, stats=stats), stats).strip()
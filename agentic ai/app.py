@@ -1,7 +1,15 @@
+import os
+import time
+
 import streamlit as st
-from pypdf import PdfReader
 from agent import Agent
-from tools import build_vector_store
+from tools import add_document, corpus, get_embedder, remove_document, warm_up
+from pdf_loader import iter_pages
+from chunker import ChunkSpans, chunk_page_spans
+from doc_registry import document_id, estimate_size, registry
+
+# How long a session waits for another one ingesting the same PDF
+INGEST_WAIT_S = float(os.getenv("INGEST_WAIT_S", "300"))
 
 if "result" not in st.session_state:
     st.session_state.result = None
@@ -11,43 +19,129 @@ st.set_page_config(page_title="Agentic RAG", layout="wide")
 st.title("📄 Agentic RAG System")
 st.markdown("Upload a PDF and ask questions. Answers come ONLY from the document.")
 
+# The embedding model loads in the background while a file is picked
+warm_up()
+
 uploaded_file = st.file_uploader("Upload a PDF", type=["pdf"])
 
-def extract_text(pdf_file):
-    reader = PdfReader(pdf_file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
-
-def chunk_text(text, chunk_size=300, overlap=50):
-    chunks = []
-    start = 0
-    while start < len(text):
-        chunks.append(text[start:start + chunk_size])
-        start += chunk_size - overlap
-    return chunks
+# Dropping a document from the registry also drops it from the corpus
+registry.on_evict = lambda doc_id, doc: remove_document(doc_id)
+
+def ingest_document(pdf_file, doc_id):
+    """
+    Streams pages into token-sized chunks and adds them to the corpus as they arrive.
+
+    Returns None without reading the PDF if `doc_id` is already in the
+    corpus, e.g. because another session is ingesting the same file.
+    """
+    embedder = get_embedder()
+    page_texts = []
+    spans = []
+
+    def pages():
+        for page_number, page_text in iter_pages(pdf_file):
+            page_texts.append(page_text)
+            yield page_number, page_text
+
+    def chunk_stream():
+        for start, end, first_page, last_page, chunk in chunk_page_spans(
+            pages(),
+            tokenizer=embedder.tokenizer,
+            max_tokens=embedder.max_seq_length,
+            separator=""
+        ):
+            spans.append((start, end, first_page, last_page))
+            yield chunk
+
+    if add_document(doc_id, chunk_stream()) is None:
+        return None
+
+    text = "".join(page_texts)
+    chunks = ChunkSpans(text, [span[0] for span in spans], [span[1] for span in spans])
+    chunk_pages = [(span[2], span[3]) for span in spans]
+    if chunks:
+        corpus.set_chunks(doc_id, chunks, chunk_pages)
+
+    return {
+        "text": text,
+        "chunks": chunks,
+        "chunk_pages": chunk_pages
+    }
+
+def wait_for_document(doc_id, timeout=INGEST_WAIT_S):
+    """
+    The registry entry another session is building for `doc_id`, or None
+    if its ingest failed (the document left the corpus) or timed out.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        doc = registry.get(doc_id)
+        if doc is not None or doc_id not in corpus:
+            return doc
+        time.sleep(0.2)
+    return None
 
 if uploaded_file:
-    raw_text = extract_text(uploaded_file)
-    chunks = chunk_text(raw_text)
+    # Reruns and other sessions reuse an already ingested document
+    doc_id = document_id(uploaded_file.getvalue())
+    doc = registry.get(doc_id)
+
+    if doc is None:
+        added = ingest_document(uploaded_file, doc_id)
+        if added is None:
+            # Already in the corpus: reuse it rather than ingesting twice
+            with st.spinner("Document is being ingested by another session..."):
+                doc = wait_for_document(doc_id)
+            if doc is None:
+                if doc_id in corpus:
+                    st.error("The PDF is still being ingested; try again shortly.")
+                else:
+                    st.error("No readable text found in the PDF.")
+                st.stop()
+        else:
+            doc = added
+            if not doc["chunks"]:
+                # Only this call added the document, so only it removes it
+                remove_document(doc_id)
+                st.error("No readable text found in the PDF.")
+                st.stop()
+
+            registry.put(doc_id, doc, size=estimate_size(doc) + corpus.nbytes(doc_id))
+
+    raw_text = doc["text"]
+    chunks = doc["chunks"]
 
     st.subheader("📄 Extracted Text Preview")
     st.write(raw_text[:1000] + "...")
 
     st.info(f"Total chunks created: {len(chunks)}")
 
-    build_vector_store(chunks)
-
     query = st.text_input("Ask a question about the document")
+    whole_document = st.checkbox("Summarize the whole document")
 
     if st.button("Run Agent"):
-        if not query:
+        if not query and not whole_document:
             st.warning("Please enter a question.")
         else:
+            headings = {
+                "summary": "📌 Summary",
+                "actions": "✅ Actionable Insights"
+            }
+
+            timings = []
+
+            def render(section, token_stream, stats):
+                # Show tokens as Ollama produces them
+                st.subheader(headings[section])
+                text = st.write_stream(token_stream)
+                # Filled by this call only; empty when answered from cache
+                if stats:
+                    timings.append(stats)
+                return text
+
             with st.spinner("Agent is thinking..."):
-                agent = Agent()
-                st.session_state.result = agent.run(query)
+                agent = Agent(doc_ids=[doc_id])
+                st.session_state.result = agent.run(query, render=render, whole_document=whole_document)
 
             if st.session_state.result:
                 summary = st.session_state.result["summary"]
@@ -63,11 +157,11 @@ if uploaded_file:
                     {actions}
                     """.strip()
 
-                st.subheader("📌 Summary")
-                st.write(summary)
-
-                st.subheader("✅ Actionable Insights")
-                st.write(actions)
+                st.caption(" · ".join(
+                    f"TTFT {t['ttft_s']:.2f}s, {t['tokens_per_s']:.1f} tok/s"
+                    for t in timings
+                    if t["ttft_s"] is not None and t["tokens_per_s"]
+                ))
 
                 st.download_button(
                     label="📥 Download results as text file",
@@ -0,0 +1,280 @@
+import threading
+
+import faiss
+import numpy as np
+
+from lexical_index import LexicalIndex
+from index_factory import (
+    INDEX_TARGET,
+    INDEX_TYPE,
+    make_index,
+    resolve_index_type,
+    set_search_params,
+)
+
+# Chunk id = (document number << DOC_SHIFT) | chunk position, so a whole
+# document can be removed with one id range and ids never need remapping.
+DOC_SHIFT = 32
+
+# Compact once this share of the index belongs to removed documents
+COMPACT_RATIO = 0.25
+
+EMBED_BATCH_SIZE = 64
+
+
+class Corpus:
+    """
+    Many documents served from one ID-mapped FAISS index.
+
+    Documents are added and removed incrementally; adding one never
+    re-embeds the others. Backends that can't delete vectors (HNSW) keep
+    removed documents as tombstones that search skips until compact()
+    rebuilds the index. The backend is re-chosen with index_factory as the
+    corpus grows. Each document also gets a BM25 LexicalIndex, filled
+    from the same batches, for keyword and hybrid search.
+    """
+
+    def __init__(self, encode_fn, target=INDEX_TARGET, index_type=INDEX_TYPE):
+        self.encode_fn = encode_fn
+        self.target = target
+        self.index_type = index_type  # "auto" re-chooses as the corpus grows
+        self.index = None
+        self.kind = "flat"
+        self.documents = {}  # doc_id -> {"no", "chunks", "pages", "count", "lexical"}
+        self._doc_ids = {}   # document number -> doc_id
+        self._next_no = 0
+        self._deleted = 0    # tombstoned vectors still in the index
+        self._lock = threading.RLock()
+
+    def __contains__(self, doc_id):
+        return doc_id in self.documents
+
+    def __len__(self):
+        return len(self.documents)
+
+    @property
+    def ntotal(self):
+        return 0 if self.index is None else self.index.ntotal - self._deleted
+
+    def add_document(self, doc_id, chunks, pages=None, batch_size=EMBED_BATCH_SIZE):
+        """
+        Embed and index `chunks` under `doc_id`.
+
+        `chunks` may be a sequence or a stream of strings; a stream is
+        embedded batch by batch as it arrives. Returns the number of chunks
+        added, or None if `doc_id` is already in the corpus (possibly still
+        being added by another caller); a stream is then closed unread.
+        """
+        streamed = not hasattr(chunks, "__getitem__")
+
+        with self._lock:
+            if doc_id in self.documents:
+                if hasattr(chunks, "close"):
+                    chunks.close()
+                return None
+
+            no = self._next_no
+            self._next_no += 1
+            doc = {
+                "no": no,
+                "chunks": [] if streamed else chunks,
+                "pages": list(pages or []),
+                "count": 0,  # chunks embedded and indexed so far
+                "lexical": LexicalIndex(),
+            }
+            self.documents[doc_id] = doc
+            self._doc_ids[no] = doc_id
+
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                self._add_batch(doc, batch, streamed)
+                batch = []
+
+        if batch:
+            self._add_batch(doc, batch, streamed)
+
+        with self._lock:
+            if resolve_index_type(self.index_type, self.ntotal, self.target) != self.kind:
+                self.compact()
+
+        return doc["count"]
+
+    def set_chunks(self, doc_id, chunks, pages=None):
+        """Swap in a compact chunk store (e.g. ChunkSpans) once ingest is done."""
+        with self._lock:
+            doc = self.documents[doc_id]
+            doc["chunks"] = chunks
+            if pages is not None:
+                doc["pages"] = list(pages)
+
+    def remove_document(self, doc_id):
+        with self._lock:
+            doc = self.documents.pop(doc_id, None)
+            if doc is None:
+                return False
+
+            no = doc["no"]
+            del self._doc_ids[no]
+
+            if self.index is not None:
+                selector = faiss.IDSelectorRange(no << DOC_SHIFT, (no + 1) << DOC_SHIFT)
+                try:
+                    self.index.remove_ids(selector)
+                except RuntimeError:
+                    # No removal support in this backend: tombstone instead
+                    self._deleted += doc["count"]
+
+                if self._deleted > COMPACT_RATIO * self.index.ntotal:
+                    self.compact()
+
+            return True
+
+    def search(self, query_vectors, k=5, doc_ids=None):
+        """
+        Top-k chunks per query, optionally only from `doc_ids`.
+
+        Returns one list per query of dicts with doc_id, position, chunk,
+        page and distance, nearest first.
+        """
+        query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+        if query_vectors.ndim == 1:
+            query_vectors = query_vectors.reshape(1, -1)
+
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return [[] for _ in range(len(query_vectors))]
+
+            allowed = None
+            if doc_ids is not None:
+                allowed = {self.documents[d]["no"] for d in doc_ids if d in self.documents}
+
+            # Filtered-out and tombstoned hits use up result slots, so
+            # over-fetch and widen until every query has k hits.
+            fetch = k if allowed is None and not self._deleted else k * 4
+            while True:
+                fetch = min(fetch, self.index.ntotal)
+                distances, ids = self.index.search(query_vectors, fetch)
+                results = [self._hits(row_d, row_i, k, allowed) for row_d, row_i in zip(distances, ids)]
+
+                if fetch >= self.index.ntotal or all(len(hits) == k for hits in results):
+                    return results
+                fetch *= 4
+
+    def search_lexical(self, query, k=5, doc_ids=None):
+        """BM25 top-k chunks for `query`; hits as in search() with a "score"
+        instead of a distance. Needs no embedding."""
+        with self._lock:
+            if doc_ids is None:
+                doc_ids = list(self.documents)
+
+            hits = []
+            for doc_id in doc_ids:
+                doc = self.documents.get(doc_id)
+                if doc is None:
+                    continue
+                for position, score in doc["lexical"].search(query, k):
+                    hits.append({
+                        "doc_id": doc_id,
+                        "position": position,
+                        "chunk": doc["chunks"][position],
+                        "page": doc["pages"][position] if position < len(doc["pages"]) else None,
+                        "distance": None,
+                        "score": score,
+                    })
+
+            hits.sort(key=lambda hit: hit["score"], reverse=True)
+            return hits[:k]
+
+    def compact(self):
+        """
+        Rebuild the index from live documents only.
+
+        Vectors come back through `encode_fn`, i.e. the embedding cache, so
+        nothing is re-embedded unless it was evicted. The backend is chosen
+        again for the current corpus size.
+        """
+        with self._lock:
+            vectors = []
+            ids = []
+            for doc in self.documents.values():
+                if not doc["count"]:
+                    continue
+                texts = list(doc["chunks"][:doc["count"]])
+                vectors.append(np.asarray(self.encode_fn(texts), dtype=np.float32))
+                ids.append((doc["no"] << DOC_SHIFT) + np.arange(doc["count"], dtype=np.int64))
+
+            self._deleted = 0
+            if not vectors:
+                self.index = None
+                self.kind = "flat"
+                return
+
+            vectors = np.ascontiguousarray(np.vstack(vectors))
+            ids = np.concatenate(ids)
+
+            self.kind = resolve_index_type(self.index_type, len(vectors), self.target)
+            base = make_index(self.kind, vectors.shape[1], len(vectors), self.target)
+            if not base.is_trained:
+                base.train(vectors)
+            set_search_params(base, self.target)
+
+            self.index = faiss.IndexIDMap2(base)
+            self.index.add_with_ids(vectors, ids)
+
+    def nbytes(self, doc_id=None):
+        """Approximate vector and BM25 memory for one document, or the whole corpus."""
+        if self.index is None:
+            return 0
+        if doc_id is None:
+            lexical = sum(doc["lexical"].nbytes for doc in self.documents.values())
+            return self.index.ntotal * self.index.d * 4 + lexical
+        doc = self.documents[doc_id]
+        return doc["count"] * self.index.d * 4 + doc["lexical"].nbytes
+
+    def _add_batch(self, doc, batch, streamed):
+        # Embed outside the lock so searches on other documents aren't blocked
+        vectors = np.ascontiguousarray(self.encode_fn(batch), dtype=np.float32)
+
+        with self._lock:
+            if self._doc_ids.get(doc["no"]) is None:
+                return  # removed while it was still being ingested
+
+            if self.index is None:
+                self.kind = "flat"
+                self.index = faiss.IndexIDMap2(make_index("flat", vectors.shape[1], 0))
+
+            start = doc["count"]
+            ids = (doc["no"] << DOC_SHIFT) + np.arange(start, start + len(batch), dtype=np.int64)
+            if streamed:
+                # Keep chunk text for streamed documents until set_chunks()
+                doc["chunks"].extend(batch)
+            self.index.add_with_ids(vectors, ids)
+            doc["lexical"].extend(batch)
+            doc["count"] += len(batch)
+
+    def _hits(self, distances, ids, k, allowed):
+        hits = []
+        for distance, chunk_id in zip(distances, ids):
+            if chunk_id < 0:
+                continue
+
+            no = int(chunk_id) >> DOC_SHIFT
+            doc_id = self._doc_ids.get(no)
+            if doc_id is None or (allowed is not None and no not in allowed):
+                continue
+
+            doc = self.documents[doc_id]
+            position = int(chunk_id) & ((1 << DOC_SHIFT) - 1)
+            hits.append({
+                "doc_id": doc_id,
+                "position": position,
+                "chunk": doc["chunks"][position],
+                "page": doc["pages"][position] if position < len(doc["pages"]) else None,
+                "distance": float(distance),
+            })
+            if len(hits) == k:
+                break
+
+        return hits
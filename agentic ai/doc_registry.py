@@ -0,0 +1,114 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+REGISTRY_MAX_MB = float(os.getenv("DOC_REGISTRY_MAX_MB", "1024"))
+
+
+def document_id(data: bytes) -> str:
+    """Content hash of an uploaded file, used as its registry key."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def estimate_size(obj) -> int:
+    """Rough memory footprint in bytes of a registry entry."""
+    if isinstance(obj, dict):
+        return sum(estimate_size(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(estimate_size(item) for item in obj)
+    if hasattr(obj, "nbytes"):
+        return int(obj.nbytes)
+    if hasattr(obj, "ntotal") and hasattr(obj, "d"):
+        # FAISS index: flat storage of float32 vectors
+        return int(obj.ntotal) * int(obj.d) * 4
+    if hasattr(getattr(obj, "index", None), "ntotal"):
+        # LangChain vector store wrapping a FAISS index
+        return estimate_size(obj.index)
+    if isinstance(obj, (str, bytes)):
+        return sys.getsizeof(obj)
+    return 0
+
+
+class DocumentRegistry:
+    """
+    Process-wide LRU cache of ingested documents keyed by content hash.
+
+    Streamlit re-runs the app script on every interaction, but imported
+    modules stay loaded, so a registry created at module level survives
+    reruns and is shared by every session. Entries are evicted least
+    recently used first once their estimated size exceeds `max_bytes`;
+    `on_evict(doc_id, entry)` is called for each one, e.g. to release
+    resources held elsewhere.
+    """
+
+    def __init__(self, max_bytes=None, on_evict=None):
+        if max_bytes is None:
+            max_bytes = REGISTRY_MAX_MB * 1024 * 1024
+
+        self.max_bytes = int(max_bytes)
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # doc_id -> (entry, size)
+        self._lock = threading.Lock()
+
+    def get(self, doc_id):
+        with self._lock:
+            if doc_id not in self._entries:
+                return None
+            self._entries.move_to_end(doc_id)
+            return self._entries[doc_id][0]
+
+    def put(self, doc_id, entry, size=None):
+        if size is None:
+            size = estimate_size(entry)
+
+        with self._lock:
+            self._entries[doc_id] = (entry, size)
+            self._entries.move_to_end(doc_id)
+            evicted = self._evict(keep=doc_id)
+
+        for evicted_id, evicted_entry in evicted:
+            if self.on_evict is not None:
+                self.on_evict(evicted_id, evicted_entry)
+
+        return entry
+
+    def get_or_build(self, doc_id, build_fn):
+        entry = self.get(doc_id)
+        if entry is None:
+            entry = self.put(doc_id, build_fn())
+        return entry
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._entries.pop(doc_id, None)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return sum(size for _, size in self._entries.values())
+
+    def __contains__(self, doc_id):
+        with self._lock:
+            return doc_id in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self, keep):
+        evicted = []
+        total = sum(size for _, size in self._entries.values())
+        # The newest document is always kept, even if it alone exceeds the cap
+        while total > self.max_bytes and len(self._entries) > 1:
+            doc_id, (entry, size) = next(iter(self._entries.items()))
+            if doc_id == keep:
+                break
+            del self._entries[doc_id]
+            evicted.append((doc_id, entry))
+            total -= size
+        return evicted
+
+
+# Shared by every session of the app
+registry = DocumentRegistry()
@@ -0,0 +1,264 @@
+import hashlib
+import json
+import math
+import os
+import time
+
+import faiss
+import numpy as np
+
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto")  # auto | flat | hnsw | ivf_flat | ivf_pq
+INDEX_TARGET = os.getenv("INDEX_TARGET", "balanced")  # recall | balanced | latency
+INDEX_DIR = os.getenv("INDEX_DIR", ".index_cache")
+# Persisted indexes beyond this are evicted, least recently used first
+INDEX_CACHE_MAX_MB = float(os.getenv("INDEX_CACHE_MAX_MB", "2048"))
+
+# Below this many vectors brute force is already sub-millisecond and exact
+FLAT_MAX = 5_000
+
+# Per target: (largest corpus for HNSW, largest corpus for IVF-Flat);
+# anything bigger uses IVF-PQ.
+SIZE_LIMITS = {
+    "recall": (1_000_000, 5_000_000),
+    "balanced": (200_000, 2_000_000),
+    "latency": (50_000, 500_000),
+}
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = {"recall": 128, "balanced": 64, "latency": 32}
+IVF_NPROBE = {"recall": 32, "balanced": 16, "latency": 8}
+
+# FAISS wants ~39 training points per centroid (and per PQ code)
+MIN_POINTS_PER_CENTROID = 39
+PQ_BITS = 8
+
+
+def choose_index_type(n_vectors, target=INDEX_TARGET):
+    if target not in SIZE_LIMITS:
+        raise ValueError(f"Unknown index target: {target}")
+
+    hnsw_max, ivf_flat_max = SIZE_LIMITS[target]
+    if n_vectors <= FLAT_MAX:
+        return "flat"
+    if n_vectors <= hnsw_max:
+        return "hnsw"
+    if n_vectors <= ivf_flat_max:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def _nlist(n_vectors):
+    # Usual rule of thumb of ~4 * sqrt(n) inverted lists, capped so every
+    # centroid still gets enough training points.
+    nlist = int(4 * math.sqrt(n_vectors))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_subquantizers(dim):
+    for m in (64, 48, 32, 16, 8):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def resolve_index_type(kind, n_vectors, target=INDEX_TARGET):
+    """Turn "auto" into a concrete type and fall back when too few vectors to train."""
+    if kind == "auto":
+        kind = choose_index_type(n_vectors, target)
+
+    # IVF-PQ needs 2**PQ_BITS points to train its codebooks
+    if kind == "ivf_pq" and n_vectors < MIN_POINTS_PER_CENTROID * 2 ** PQ_BITS:
+        kind = "ivf_flat"
+    if kind == "ivf_flat" and n_vectors < MIN_POINTS_PER_CENTROID:
+        kind = "flat"
+
+    return kind
+
+
+def make_index(kind, dim, n_vectors, target=INDEX_TARGET):
+    """Create an empty (untrained) index of the given kind."""
+    if kind == "flat":
+        return faiss.IndexFlatL2(dim)
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+
+    quantizer = faiss.IndexFlatL2(dim)
+    nlist = _nlist(n_vectors)
+
+    if kind == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist)
+
+    if kind == "ivf_pq":
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), PQ_BITS)
+
+    raise ValueError(f"Unknown index type: {kind}")
+
+
+def set_search_params(index, target=INDEX_TARGET):
+    """Apply the recall/latency trade-off for `target` to a built index."""
+    if isinstance(index, faiss.IndexHNSWFlat):
+        index.hnsw.efSearch = HNSW_EF_SEARCH[target]
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(IVF_NPROBE[target], index.nlist)
+    return index
+
+
+def build_index(embeddings, kind=INDEX_TYPE, target=INDEX_TARGET, cache_dir=INDEX_DIR,
+                cache_max_bytes=None):
+    """
+    Build a FAISS index over `embeddings`, picking the backend by corpus size.
+
+    Non-flat indexes are persisted under `cache_dir`, keyed by a hash of the
+    vectors, so re-ingesting the same corpus skips training and graph
+    construction. The directory is kept under `cache_max_bytes` (default
+    INDEX_CACHE_MAX_MB) by deleting the least recently used indexes.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n_vectors, dim = embeddings.shape
+
+    kind = resolve_index_type(kind, n_vectors, target)
+
+    if kind == "flat":
+        index = make_index(kind, dim, n_vectors)
+        index.add(embeddings)
+        return index
+
+    path = None
+    if cache_dir:
+        key = hashlib.sha1(embeddings.tobytes()).hexdigest()[:16]
+        path = os.path.join(cache_dir, f"{kind}-{n_vectors}x{dim}-{key}.faiss")
+        if os.path.exists(path):
+            index = faiss.read_index(path)
+            # The modification time doubles as the last-used time for eviction
+            os.utime(path)
+            return set_search_params(index, target)
+
+    index = make_index(kind, dim, n_vectors, target)
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+
+    if path:
+        save_index(index, path, kind=kind, target=target)
+        if cache_max_bytes is None:
+            cache_max_bytes = INDEX_CACHE_MAX_MB * 1024 * 1024
+        evict_index_cache(cache_dir, cache_max_bytes, keep=path)
+
+    return set_search_params(index, target)
+
+
+def evict_index_cache(cache_dir, max_bytes, keep=None):
+    """
+    Delete the least recently used indexes in `cache_dir` until the rest
+    fit in `max_bytes`; `keep` (the index just written) is never deleted.
+    Returns the paths removed.
+    """
+    indexes = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".faiss"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Evicted by another process meanwhile
+            continue
+        indexes.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in indexes)
+    removed = []
+    for _, size, path in sorted(indexes):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        for stale in (path, path + ".json"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        total -= size
+        removed.append(path)
+
+    return removed
+
+
+def upgrade_index(index, kind=INDEX_TYPE, target=INDEX_TARGET, cache_dir=INDEX_DIR):
+    """
+    Rebuild a flat index with the backend suited to its final size.
+
+    Streaming ingest adds batches to a flat index because the corpus size
+    isn't known up front; this swaps it for an ANN index once it is.
+    """
+    if index is None or not isinstance(index, faiss.IndexFlat):
+        return index
+
+    if kind == "auto":
+        kind = choose_index_type(index.ntotal, target)
+    if kind == "flat":
+        return index
+
+    return build_index(index.reconstruct_n(0, index.ntotal), kind, target, cache_dir)
+
+
+def save_index(index, path, **params):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    faiss.write_index(index, path)
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"ntotal": index.ntotal, "dim": index.d, **params}, f)
+
+
+def load_index(path):
+    index = faiss.read_index(path)
+    params_path = path + ".json"
+    if os.path.exists(params_path):
+        with open(params_path, "r", encoding="utf-8") as f:
+            set_search_params(index, json.load(f).get("target", INDEX_TARGET))
+    return index
+
+
+def recall_latency_report(embeddings, queries, k=5, kinds=("flat", "hnsw", "ivf_flat", "ivf_pq"),
+                          target=INDEX_TARGET):
+    """
+    Compare each backend with exact flat search on the same queries.
+
+    Returns one dict per backend with build time, mean/p95 per-query
+    search latency in milliseconds and recall@k against the flat results.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    exact = faiss.IndexFlatL2(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, k)
+
+    report = []
+    for kind in kinds:
+        start = time.perf_counter()
+        index = build_index(embeddings, kind=kind, target=target, cache_dir=None)
+        build_s = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty_like(truth)
+        for i in range(len(queries)):
+            start = time.perf_counter()
+            _, ids = index.search(queries[i:i + 1], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = ids[0]
+
+        hits = sum(len(set(found[i]) & set(truth[i])) for i in range(len(queries)))
+        report.append({
+            "index": type(index).__name__,
+            "requested": kind,
+            "n_vectors": int(index.ntotal),
+            "build_s": round(build_s, 3),
+            "mean_ms": round(float(np.mean(latencies)), 4),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+            f"recall@{k}": round(hits / (len(queries) * k), 4),
+        })
+
+    return report
@@ -1,22 +1,44 @@
-import requests
+import os
+import sys
+
+# Shared with the other apps, from the repo root (see shared/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.llm_client import get_ollama_client
+from shared.response_cache import ResponseCache
 
 OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "llama3:latest"  # change if needed
+OPTIONS = {
+    "temperature": 0.1,
+    "num_predict": 300
+}
+
+# Shared keep-alive pool and concurrency limit for every Ollama call
+client = get_ollama_client(OLLAMA_URL)
+
+# Latency stats of recent calls, newest last
+call_stats = client.call_stats
+
+# Identical prompts (reruns, repeated goals) are answered from disk
+response_cache = ResponseCache()
 
 def generate_text(prompt: str) -> str:
-    payload = {
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": 0.1,
-            "num_predict": 300
-        }
-    }
-
-    response = requests.post(OLLAMA_URL, json=payload, timeout=180)
-
-    if response.status_code != 200:
-        raise RuntimeError(response.text)
-
-    return response.json()["response"].strip()
\ No newline at end of file
+    return response_cache.cached(
+        MODEL_NAME, OPTIONS["temperature"], prompt,
+        lambda: client.generate(MODEL_NAME, prompt, OPTIONS)
+    )
+
+def stream_text(prompt: str, stats=None):
+    """Yields the completion token by token from Ollama's NDJSON stream.
+
+    Time-to-first-token and tokens/sec go into the `stats` dict (and
+    `call_stats`) once the stream finishes. A cached completion is
+    yielded in one piece and makes no call, leaving `stats` empty.
+    """
+    return response_cache.cached_stream(
+        MODEL_NAME, OPTIONS["temperature"], prompt,
+        lambda: client.stream(MODEL_NAME, prompt, OPTIONS, stats)
+    )
+
+async def agenerate_text(prompt: str) -> str:
+    return await client.agenerate(MODEL_NAME, prompt, OPTIONS)
@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+SUMMARY_MAP_TOKENS = int(os.getenv("SUMMARY_MAP_TOKENS", "1500"))
+SUMMARY_FAN_IN = int(os.getenv("SUMMARY_FAN_IN", "4"))
+
+# English prose averages about four characters per LLM token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack(pieces, token_budget=SUMMARY_MAP_TOKENS):
+    """
+    Group consecutive pieces into batches of at most `token_budget` tokens.
+
+    A single piece over the budget is cut into budget-sized slices.
+    """
+    max_chars = token_budget * CHARS_PER_TOKEN
+    batches = []
+    current = []
+    current_tokens = 0
+
+    for piece in pieces:
+        for start in range(0, max(len(piece), 1), max_chars):
+            part = piece[start:start + max_chars]
+            tokens = estimate_tokens(part)
+
+            if current and current_tokens + tokens > token_budget:
+                batches.append("\n\n".join(current))
+                current = []
+                current_tokens = 0
+
+            current.append(part)
+            current_tokens += tokens
+
+    if current:
+        batches.append("\n\n".join(current))
+
+    return batches
+
+
+def condense(pieces, summarize_fn, concurrency=SUMMARY_CONCURRENCY,
+             token_budget=SUMMARY_MAP_TOKENS, fan_in=SUMMARY_FAN_IN):
+    """
+    Map-reduce `pieces` down to text that fits in one prompt.
+
+    Batches of up to `token_budget` tokens are summarized concurrently by
+    `summarize_fn` on a pool of `concurrency` workers, then the partial
+    summaries are merged `fan_in` at a time, level by level, until they fit
+    the budget together. Text that already fits is returned unchanged, so
+    short contexts cost no extra LLM calls.
+    """
+    batches = pack(pieces, token_budget)
+    if len(batches) <= 1:
+        return batches[0] if batches else ""
+
+    # A fan-in of 1 would pass every summary through unmerged, forever
+    fan_in = max(2, fan_in)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        summaries = list(pool.map(summarize_fn, batches))
+
+        while sum(estimate_tokens(s) for s in summaries) > token_budget and len(summaries) > 1:
+            groups = [summaries[i:i + fan_in] for i in range(0, len(summaries), fan_in)]
+            summaries = list(pool.map(
+                lambda group: group[0] if len(group) == 1 else summarize_fn("\n\n".join(group)),
+                groups
+            ))
+
+    return "\n\n".join(summaries)
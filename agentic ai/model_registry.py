@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+
+from embedding_backend import EMBEDDING_BACKEND, load_embedder
+
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+
+
+class ModelRegistry:
+    """
+    Process-wide, lazily loaded embedding models.
+
+    One instance is kept per (model, backend, device), so every module and
+    every Streamlit session of a worker shares the same weights. Models
+    load on first use, or ahead of time on a background thread with
+    warm_up(). Concurrent first uses wait for a single load.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.load_times = {}  # key -> seconds spent loading
+
+    def get(self, model_name, backend=EMBEDDING_BACKEND, device=EMBEDDING_DEVICE):
+        key = (model_name, backend, device)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key not in self._models:
+                start = time.perf_counter()
+                self._models[key] = load_embedder(model_name, backend, device=device)
+                self.load_times[key] = time.perf_counter() - start
+            return self._models[key]
+
+    def warm_up(self, model_name, backend=EMBEDDING_BACKEND, device=EMBEDDING_DEVICE):
+        """Load a model on a daemon thread so the first request doesn't wait for it."""
+        if self.is_loaded(model_name, backend, device):
+            return None
+
+        thread = threading.Thread(
+            target=self.get,
+            args=(model_name, backend, device),
+            name=f"warm-up {model_name}",
+            daemon=True
+        )
+        thread.start()
+        return thread
+
+    def is_loaded(self, model_name, backend=EMBEDDING_BACKEND, device=EMBEDDING_DEVICE):
+        return (model_name, backend, device) in self._models
+
+    def stats(self) -> dict:
+        return {
+            "/".join(key): {"loaded": key in self._models, "load_s": self.load_times.get(key)}
+            for key in self._key_locks
+        }
+
+
+# Shared by every module and session in the process
+models = ModelRegistry()
@@ -0,0 +1,64 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PAGE_BATCH_SIZE = int(os.getenv("PDF_PAGE_BATCH_SIZE", "16"))
+
+# Parsed once per worker process by _init_worker
+_worker_reader = None
+
+
+def _read_bytes(file) -> bytes:
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    if hasattr(file, "read"):
+        file.seek(0)
+        return file.read()
+    with open(file, "rb") as f:
+        return f.read()
+
+def _init_worker(pdf_bytes):
+    global _worker_reader
+    _worker_reader = PdfReader(io.BytesIO(pdf_bytes))
+
+def _extract_page_range(start, end, reader=None):
+    reader = reader or _worker_reader
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def iter_pages(file, workers=PDF_WORKERS, batch_size=PAGE_BATCH_SIZE):
+    """
+    Yield (page_number, page_text) for every page, in order, 1-based.
+
+    Pages are extracted in batches on a process pool. Every batch is
+    submitted up front, so the caller can chunk and embed the first pages
+    while later ones are still being extracted.
+    """
+    pdf_bytes = _read_bytes(file)
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    num_pages = len(reader.pages)
+
+    ranges = [
+        (start, min(start + batch_size, num_pages))
+        for start in range(0, num_pages, batch_size)
+    ]
+
+    if workers <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            for offset, page_text in enumerate(_extract_page_range(start, end, reader)):
+                yield start + offset + 1, page_text
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(ranges)),
+        initializer=_init_worker,
+        initargs=(pdf_bytes,)
+    ) as pool:
+        futures = [pool.submit(_extract_page_range, start, end) for start, end in ranges]
+        for (start, _), future in zip(ranges, futures):
+            for offset, page_text in enumerate(future.result()):
+                yield start + offset + 1, page_text
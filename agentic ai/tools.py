@@ -1,19 +1,60 @@
-import faiss
+from collections import deque
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from llm import generate_text
+from llm import generate_text, stream_text
 from prompt import build_rag_answer_prompt
+from embedding_cache import EmbeddingCache
+from embedding_backend import EMBED_BATCH_SIZE, EMBEDDING_BACKEND, model_id
+from model_registry import models
+from embedding_service import EmbeddingService
+from corpus import Corpus
+from query_cache import QueryEmbeddingCache
+from map_reduce import condense
+from context_packer import pack_context
+from lexical_index import is_keyword_query, reciprocal_rank_fusion
+from adaptive_k import RETRIEVE_K_MAX, RETRIEVE_K_MIN, adaptive_cutoff
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+DEFAULT_DOC_ID = "default"
+
+# Hybrid retrieval takes k * HYBRID_FETCH candidates from each retriever
+HYBRID_FETCH = 2
 
 # Global objects (cached once)
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-index = None
-chunks = []
+embedding_cache = EmbeddingCache(model_id(MODEL_NAME, EMBEDDING_BACKEND))
+
+def get_embedder():
+    """The shared embedding model, loaded on first use rather than at import.
+
+    EMBEDDING_BACKEND picks torch / onnx / onnx_int8.
+    """
+    return models.get(MODEL_NAME)
 
-def summarize(context: str) -> str:
-    return generate_text(f"Summarize the following:\n{context}")
+def warm_up():
+    """Starts loading the embedding model in the background."""
+    return models.warm_up(MODEL_NAME)
 
-def extract_action_items(context: str) -> str:
-    return generate_text(
+def _summary_prompt(text):
+    return f"Summarize the following:\n{text}"
+
+def summarize(context, stream: bool = False, stats=None):
+    """Returns the summary, or a token generator if `stream` is set.
+
+    `context` is a string or a list of chunks. Context too long for one
+    prompt is map-reduced to partial summaries in parallel first; only the
+    final summary is streamed, and its timing goes into `stats`.
+    """
+    pieces = context.split("\n") if isinstance(context, str) else list(context)
+    context = condense(pieces, lambda text: generate_text(_summary_prompt(text)))
+
+    if stream:
+        return stream_text(_summary_prompt(context), stats)
+    return generate_text(_summary_prompt(context))
+
+def extract_action_items(context: str, stream: bool = False, stats=None):
+    """Returns the action items, or a token generator if `stream` is set."""
+    generate = (lambda prompt: stream_text(prompt, stats)) if stream else generate_text
+    return generate(
         f"""
     From the text below, extract 5–7 concrete, actionable insights.
     Each action should:
@@ -29,47 +70,129 @@ def extract_action_items(context: str) -> str:
     )
 
 
-def build_vector_store(text_chunks):
-    """Builds a FAISS index from `text_chunks`.
+# Encode calls from every session are batched together on one worker
+embedding_service = EmbeddingService(get_embedder)
+
+
+def _encode(text_chunks):
+    # Cached float32 embeddings; only unseen chunks are encoded
+    return embedding_cache.encode(text_chunks, embedding_service.encode)
+
+
+# Every loaded document lives in one ID-mapped index
+corpus = Corpus(_encode)
 
-    This caches `chunks` and `index` globally for later retrieval.
+# Chunks kept and why retrieval stopped, per recent query, newest last
+retrieval_stats = deque(maxlen=100)
+
+# Agent loops and reruns repeat queries; cache their embeddings
+query_cache = QueryEmbeddingCache(embedding_service.encode)
+
+
+def build_vector_store(text_chunks, doc_id=DEFAULT_DOC_ID):
+    """Indexes `text_chunks` as document `doc_id`, replacing any previous version.
+
+    Other documents in the corpus are left untouched.
     """
-    global index, chunks
     if not text_chunks:
         raise ValueError("text_chunks must be a non-empty list of strings")
 
-    chunks = list(text_chunks)
+    corpus.remove_document(doc_id)
+    corpus.add_document(doc_id, list(text_chunks))
+
+
+def add_document(doc_id, text_chunks, pages=None):
+    """Adds a document to the shared corpus without re-embedding existing ones.
+
+    `text_chunks` may be a stream; it is embedded in batches as it arrives.
+    Returns the number of chunks indexed, or None if `doc_id` was already
+    loaded (or is being loaded by another session).
+    """
+    return corpus.add_document(doc_id, text_chunks, pages, batch_size=EMBED_BATCH_SIZE)
 
-    # Ensure numpy output and float32 dtype for FAISS
-    embeddings = embedder.encode(chunks, convert_to_numpy=True)
-    if embeddings.ndim == 1:
-        embeddings = embeddings.reshape(1, -1)
-    embeddings = embeddings.astype('float32')
 
-    d = embeddings.shape[1]
-    index = faiss.IndexFlatL2(d)
-    index.add(embeddings)
+def remove_document(doc_id):
+    return corpus.remove_document(doc_id)
 
 
-def retrieve_context(query, k=5):
-    """Retrieves top-k chunks for `query` from the FAISS index.
+def retrieve_context(query, k=None, doc_ids=None):
+    """Retrieves top-k chunks for `query` from the corpus.
 
-    Raises a RuntimeError if the index hasn't been built yet.
+    With k=None, between RETRIEVE_K_MIN and RETRIEVE_K_MAX chunks are
+    returned, cut off where the matches turn poor.
+    `doc_ids` restricts the search to those documents; None searches all.
+    Raises a RuntimeError if no document has been indexed yet.
     """
-    global index, chunks
-    if index is None:
-        raise RuntimeError("Vector store is not built. Call build_vector_store() first.")
+    return retrieve_context_batch([query], k=k, doc_ids=doc_ids)[0]
 
-    query_vec = embedder.encode([query], convert_to_numpy=True).astype('float32')
-    distances, indices = index.search(query_vec, k)
 
-    results = []
-    for idx in indices[0]:
-        if idx < 0 or idx >= len(chunks):
-            continue
-        results.append(chunks[idx])
+def retrieve_context_batch(queries, k=None, doc_ids=None):
+    """Retrieves top-k context for many queries with one encode and one search.
+
+    Dense and BM25 results are fused with reciprocal rank fusion; keyword
+    lookups (codes, clause numbers, quoted phrases) that BM25 can answer
+    skip the embedder. k=None retrieves adaptively (see retrieve_context)
+    and records why it stopped in `retrieval_stats`. Returns one context
+    string per query, with overlapping chunks merged and the total kept
+    within the context token budget.
+    """
+    if not len(corpus):
+        raise RuntimeError("Vector store is not built. Call build_vector_store() first.")
 
-    return "\n".join(results)
+    adaptive = k is None
+    if adaptive:
+        k = RETRIEVE_K_MAX
+
+    results = [None] * len(queries)
+
+    dense = []
+    for i, query in enumerate(queries):
+        if is_keyword_query(query):
+            results[i] = corpus.search_lexical(query, k, doc_ids=doc_ids)
+            if results[i]:
+                continue
+        dense.append(i)
+
+    if dense:
+        query_vecs = query_cache.encode([queries[i] for i in dense])
+        dense_results = corpus.search(query_vecs, k * HYBRID_FETCH, doc_ids=doc_ids)
+
+        for i, dense_hits in zip(dense, dense_results):
+            lexical_hits = corpus.search_lexical(queries[i], k * HYBRID_FETCH, doc_ids=doc_ids)
+            by_key = {(hit["doc_id"], hit["position"]): hit for hit in lexical_hits + dense_hits}
+            fused = reciprocal_rank_fusion([
+                [(hit["doc_id"], hit["position"]) for hit in dense_hits],
+                [(hit["doc_id"], hit["position"]) for hit in lexical_hits],
+            ])
+            results[i] = [by_key[key] for key in fused[:k]]
+
+    for query, hits in zip(queries, results):
+        reason = "fixed_k"
+        if adaptive:
+            n, reason = adaptive_cutoff([hit["distance"] for hit in hits], RETRIEVE_K_MIN, k)
+            del hits[n:]
+        retrieval_stats.append({"query": query, "k": len(hits), "reason": reason})
+
+    return [
+        pack_context(
+            ((corpus.documents[hit["doc_id"]]["chunks"], hit["position"]) for hit in hits),
+            separator="\n"
+        )
+        for hits in results
+    ]
+
+
+def document_chunks(doc_ids=None):
+    """All chunk texts of `doc_ids` (default: every document), in order."""
+    if doc_ids is None:
+        doc_ids = list(corpus.documents)
+
+    chunks = []
+    for doc_id in doc_ids:
+        doc = corpus.documents.get(doc_id)
+        if doc is not None:
+            chunks.extend(doc["chunks"][:doc["count"]])
+    return chunks
 
 
 def answer_question(context, question):
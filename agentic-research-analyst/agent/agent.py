@@ -1,24 +1,23 @@
 from langchain.agents import create_agent
 from llm.groq_llm import get_llm
-from agent.tools import (
-    retrieve_context,
-    summarize_context,
-    extract_action_items,
-)
+from agent.tools import build_tools
 from agent.planner import plan_steps
 from agent.evaluator import self_evaluate
 from agent.external_tools import external_search
 
-def build_agent():
-    llm = get_llm()
+def build_agent(vector_store, llm=None):
+    """An agent whose document tools search `vector_store`."""
+    llm = llm or get_llm()
+    tools = build_tools(vector_store, llm)
 
     agent = create_agent(
         model=llm,
         tools=[
             plan_steps,
-            retrieve_context,
-            summarize_context,
-            extract_action_items,
+            tools["retrieve_context"],
+            tools["retrieve_context_batch"],
+            tools["summarize_context"],
+            tools["extract_action_items"],
             self_evaluate,
             external_search
         ],
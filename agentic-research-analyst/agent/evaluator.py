@@ -1,12 +1,14 @@
 from langchain.tools import tool
 
+from utils.tracing import span
+
 @tool
 def self_evaluate(goal: str, answer: str) -> str:
     """
     Evaluate answer completeness and determine if external data is required.
     """
-    print(f"[DEBUG] self_evaluate executing (answer provided: {bool(answer)})")
-    return f"""
+    with span("self_evaluate", "tool", answer_provided=bool(answer)):
+        return f"""
         Evaluate the following answer against the goal.
 
         GOAL:
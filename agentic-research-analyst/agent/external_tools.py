@@ -1,5 +1,7 @@
 from langchain.tools import tool
 
+from utils.tracing import span
+
 @tool
 def external_search(query: str) -> str:
     """
@@ -7,8 +9,8 @@ def external_search(query: str) -> str:
     All results MUST be labeled as external.
     """
     # Stub for now (safe + testable)
-    print(f"[DEBUG] external_search executing with query: {query!r}")
-    return f"""
+    with span("external_search", "tool", query=query):
+        return f"""
 [EXTERNAL SOURCE]
 Query: {query}
 
@@ -1,14 +1,15 @@
 from langchain.tools import tool
 
+from utils.tracing import span
+
 @tool
 def plan_steps(goal: str) -> str:
     """
     Decompose the user's goal into explicit reasoning steps.
     This is a planning-only step. Do not answer the question.
     """
-    print(f"[DEBUG] planner.plan_steps executing with goal: {goal!r}")
-
-    return f"""
+    with span("planner.plan_steps", "tool"):
+        return f"""
 Plan:
 1. Retrieve relevant document context for the goal: {goal}
 2. Perform document-grounded analysis
@@ -1,148 +1,202 @@
 from langchain.tools import tool
 import os
+import sys
 from agent.planner import plan_steps
 from agent.evaluator import self_evaluate
 from agent.external_tools import external_search
+from utils.map_reduce import condense
+from rag.adaptive_k import RETRIEVE_K_MIN, adaptive_cutoff
+from utils.tracing import span
 
+# Shared with the other apps, from the repo root (see shared/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from shared.response_cache import ResponseCache
 
-# Runtime-injected globals
-_vector_store = None
-_llm = None
-_last_context = None
 
+# Upper bound on chunks per search; fewer are returned when the tail
+# matches are poor (see rag.adaptive_k)
 RETRIEVE_K = int(os.getenv("RETRIEVE_K", "5"))
 
+# Tool prompts repeat across reruns and re-asked goals; saves Groq quota
+_response_cache = ResponseCache()
+
 
 def set_retrieval_k(k: int):
     """Set the number of document chunks to retrieve during semantic search."""
     global RETRIEVE_K
     RETRIEVE_K = max(1, int(k))
-    print(f"[DEBUG] RETRIEVE_K set to {RETRIEVE_K}")
 
 
-def initialize_tools(vector_store, llm):
-    """
-    Initialize shared resources for agent tools.
+def _invoke(llm, prompt: str) -> str:
+    """Call the LLM, reusing the cached response to an identical prompt.
 
-    Must be called once after building the vector store and LLM.
+    The request itself is traced by the LLM's callback (see llm.groq_llm).
     """
-    global _vector_store, _llm, _last_context
-    _vector_store = vector_store
-    _llm = llm
-    _last_context = None
-    print("[DEBUG] Tools initialized: vector_store and llm assigned")
+    with span("response_cache", "cache", model=llm.model_name) as s:
+        s.set(hit=True)
 
+        def call():
+            s.set(hit=False)
+            return llm.invoke(prompt).content
 
-@tool
-def plan_steps(goal: str) -> str:
-    """
-    Break down the user's goal into a clear, ordered plan of steps.
+        return _response_cache.cached(llm.model_name, llm.temperature, prompt, call)
 
-    This tool is used at the start of reasoning to decide which tools
-    should be called and in what sequence to accomplish the goal.
-    """
-    print(f"[DEBUG] plan_steps executing with goal: {goal!r}")
 
-    if _llm is None:
-        raise RuntimeError("LLM not initialized.")
-
-    prompt = f"""
-You are a planning module for an AI Research Analyst.
+def _cut_off(docs_and_scores):
+    """Drop poor tail matches; returns (docs, stop_reason)."""
+    n, reason = adaptive_cutoff(
+        [score for _, score in docs_and_scores],
+        k_min=min(RETRIEVE_K_MIN, RETRIEVE_K),
+        k_max=RETRIEVE_K
+    )
+    return [doc for doc, _ in docs_and_scores[:n]], reason
 
-Given the user goal below, break it into a short, ordered list of steps.
-Each step should be an action such as:
-- retrieving document context
-- summarizing content
-- extracting action items
-- producing a final answer
 
-User goal:
-{goal}
+def _summary_prompt(context: str) -> str:
+    return f"""
+Summarize the following document context clearly and concisely.
+Only use the provided text.
 
-Respond with a numbered list of steps.
+{context}
 """
 
-    response = _llm.invoke(prompt)
-    print("[DEBUG] plan_steps completed (LLM invoked)")
-    return response.content
-
 
-@tool
-def retrieve_context(query: str) -> str:
+def build_tools(vector_store, llm) -> dict:
     """
-    Retrieve the most relevant document chunks related to the user query.
+    The document tools for one agent, by name, bound to `vector_store`
+    and `llm`.
 
-    Use this tool FIRST before answering any question.
-    It performs semantic similarity search over the uploaded document
-    and returns the top relevant chunks as context.
+    Agents are cached per document and shared across sessions, so each
+    gets its own tools rather than reading module globals that the last
+    session to load a document would have set.
     """
-    print(f"[DEBUG] retrieve_context executing with query: {query!r}")
-
-    if _vector_store is None:
+    if vector_store is None:
         raise RuntimeError("Vector store not initialized.")
-
-    docs = _vector_store.similarity_search(query, k=RETRIEVE_K)
-
-    context = "\n\n".join(
-        f"[Chunk {i+1}]\n{doc.page_content}"
-        for i, doc in enumerate(docs)
-    )
-
-    global _last_context
-    _last_context = context
-    print(f"[DEBUG] retrieve_context completed: {len(docs)} chunks retrieved")
-    return context
-
-
-@tool
-def summarize_context(context: str) -> str:
-    """
-    Generate a concise summary of the retrieved document context.
-
-    If no context is explicitly provided, the tool will summarize
-    the most recently retrieved document chunks.
-    """
-    print(f"[DEBUG] summarize_context executing (context provided: {bool(context)})")
-
-    if _llm is None:
+    if llm is None:
         raise RuntimeError("LLM not initialized.")
 
-    global _last_context
-    if not context and _last_context:
-        context = _last_context
-        print("[DEBUG] summarize_context using last retrieved context")
+    # The most recently retrieved context, for tools called without one
+    last_context = None
 
-    prompt = f"""
-Summarize the following document context clearly and concisely.
-Only use the provided text.
+    def summarize_text(text: str) -> str:
+        return _invoke(llm, _summary_prompt(text))
 
-{context}
-"""
-
-    response = _llm.invoke(prompt)
-    print("[DEBUG] summarize_context completed (LLM invoked)")
-    return response.content
+    @tool
+    def plan_steps(goal: str) -> str:
+        """
+        Break down the user's goal into a clear, ordered plan of steps.
 
+        This tool is used at the start of reasoning to decide which tools
+        should be called and in what sequence to accomplish the goal.
+        """
+        prompt = f"""
+You are a planning module for an AI Research Analyst.
 
-@tool
-def extract_action_items(context: str) -> str:
-    """
-    Extract 5–7 clear, actionable insights from the document context.
-
-    The output should be practical, business-focused, and grounded
-    strictly in the provided document content.
-    """
-    print(f"[DEBUG] extract_action_items executing (context provided: {bool(context)})")
+Given the user goal below, break it into a short, ordered list of steps.
+Each step should be an action such as:
+- retrieving document context
+- summarizing content
+- extracting action items
+- producing a final answer
 
-    if _llm is None:
-        raise RuntimeError("LLM not initialized.")
+User goal:
+{goal}
 
-    global _last_context
-    if not context and _last_context:
-        context = _last_context
-        print("[DEBUG] extract_action_items using last retrieved context")
+Respond with a numbered list of steps.
+"""
 
-    prompt = f"""
+        with span("plan_steps", "tool"):
+            return _invoke(llm, prompt)
+
+    @tool
+    def retrieve_context(query: str) -> str:
+        """
+        Retrieve the most relevant document chunks related to the user query.
+
+        Use this tool FIRST before answering any question.
+        It performs semantic similarity search over the uploaded document
+        and returns the top relevant chunks as context.
+        """
+        nonlocal last_context
+
+        with span("retrieve_context", "tool", query=query) as s:
+            with span("similarity_search", "retrieval", k=RETRIEVE_K) as search:
+                docs, reason = _cut_off(vector_store.similarity_search_with_score(query, k=RETRIEVE_K))
+                search.set(chunks=len(docs), stop_reason=reason)
+
+            context = "\n\n".join(
+                f"[Chunk {i+1}]\n{doc.page_content}"
+                for i, doc in enumerate(docs)
+            )
+            s.set(chunks=len(docs))
+
+        last_context = context
+        return context
+
+    @tool
+    def retrieve_context_batch(queries: list[str]) -> str:
+        """
+        Retrieve relevant document chunks for several queries at once.
+
+        Use this instead of calling retrieve_context repeatedly when a step
+        needs context on multiple sub-questions. All queries are embedded in
+        one batch, and the context is returned grouped per query.
+        """
+        nonlocal last_context
+
+        with span("retrieve_context_batch", "tool", queries=len(queries)) as s:
+            vectors = vector_store.embeddings.encode_queries(queries)
+
+            sections = []
+            total = 0
+            for query, vector in zip(queries, vectors):
+                with span("similarity_search", "retrieval", k=RETRIEVE_K) as search:
+                    docs, reason = _cut_off(vector_store.similarity_search_with_score_by_vector(vector, k=RETRIEVE_K))
+                    search.set(chunks=len(docs), stop_reason=reason)
+
+                chunks = "\n\n".join(
+                    f"[Chunk {i+1}]\n{doc.page_content}"
+                    for i, doc in enumerate(docs)
+                )
+                sections.append(f"### Query: {query}\n{chunks}")
+                total += len(docs)
+
+            context = "\n\n".join(sections)
+            s.set(chunks=total)
+
+        last_context = context
+        return context
+
+    @tool
+    def summarize_context(context: str) -> str:
+        """
+        Generate a concise summary of the retrieved document context.
+
+        If no context is explicitly provided, the tool will summarize
+        the most recently retrieved document chunks.
+        """
+        with span("summarize_context", "tool", context_provided=bool(context)):
+            if not context and last_context:
+                context = last_context
+
+            # Long context is summarized in parallel batches, then merged
+            context = condense(context.split("\n\n"), summarize_text)
+
+            return _invoke(llm, _summary_prompt(context))
+
+    @tool
+    def extract_action_items(context: str) -> str:
+        """
+        Extract 5–7 clear, actionable insights from the document context.
+
+        The output should be practical, business-focused, and grounded
+        strictly in the provided document content.
+        """
+        context_provided = bool(context)
+        if not context and last_context:
+            context = last_context
+
+        prompt = f"""
 From the following document context, extract 5–7 clear, actionable insights.
 Present them as bullet points.
 Do NOT add information not present in the document.
@@ -150,6 +204,13 @@ Do NOT add information not present in the document.
 {context}
 """
 
-    response = _llm.invoke(prompt)
-    print("[DEBUG] extract_action_items completed (LLM invoked)")
-    return response.content
+        with span("extract_action_items", "tool", context_provided=context_provided):
+            return _invoke(llm, prompt)
+
+    return {
+        "plan_steps": plan_steps,
+        "retrieve_context": retrieve_context,
+        "retrieve_context_batch": retrieve_context_batch,
+        "summarize_context": summarize_context,
+        "extract_action_items": extract_action_items,
+    }
@@ -1,10 +1,11 @@
 import streamlit as st
-from rag.ingest import ingest_pdf
-from rag.embeddings import get_embedder
-from rag.vector_store import build_vector_store
+from rag.ingest import iter_chunks
+from rag.embeddings import get_embedder, warm_up
+from rag.vector_store import build_vector_store_from_stream
 from agent.agent import build_agent
-from agent.tools import initialize_tools
 from llm.groq_llm import get_llm
+from utils.doc_registry import document_id, registry
+from utils.tracing import span, tracer
 
 def extract_final_answer(agent_response):
     messages = agent_response.get("messages", [])
@@ -17,22 +18,61 @@ def extract_final_answer(agent_response):
     return messages
 
 
+@st.cache_resource
+def load_models():
+    # Document-independent, so loaded once per process; the embedder comes
+    # from the process-wide model registry
+    return get_embedder(), get_llm()
+
+
+def ingest_document(pdf_file, embedder, llm):
+    """The document's chunks, store and agent, or None if it has no text."""
+    # Chunks are embedded while later pages are still being extracted
+    vector_store, chunks = build_vector_store_from_stream(
+        iter_chunks(pdf_file, embedder.tokenizer, embedder.max_seq_length),
+        embedder
+    )
+    if not chunks:
+        return None
+
+    return {
+        "chunks": chunks,
+        "vector_store": vector_store,
+        # The agent's tools are bound to this document's store, so sessions
+        # on different documents never search each other's
+        "agent": build_agent(vector_store, llm)
+    }
+
+
 st.set_page_config(page_title="Agentic Research Analyst", layout="wide")
 st.title("📄 Agentic AI Research & Insight Agent")
 
+# The embedding model loads in the background while a file is picked
+warm_up()
+
+# Prometheus scrape endpoint, when METRICS_PORT is set
+tracer.serve_metrics()
+
 uploaded_file = st.file_uploader("Upload a PDF", type=["pdf"])
 
 if uploaded_file:
-    chunks = ingest_pdf(uploaded_file)
-    st.success(f"Document ingested: {len(chunks)} chunks")
+    embedder, llm = load_models()
+
+    # Reruns and other sessions reuse an already ingested document
+    doc_id = document_id(uploaded_file.getvalue())
+    doc = registry.get(doc_id)
+
+    if doc is None:
+        doc = ingest_document(uploaded_file, embedder, llm)
+        if doc is None:
+            st.error("No readable text found in the PDF.")
+            st.stop()
 
-    embedder = get_embedder()
-    vector_store = build_vector_store(chunks, embedder)
+        registry.put(doc_id, doc)
 
-    llm = get_llm()
-    initialize_tools(vector_store, llm)
+    st.success(f"Document ingested: {len(doc['chunks'])} chunks")
 
-    agent = build_agent()
+    agent = doc["agent"]
 
     user_goal = st.text_input(
         "Enter your goal",
@@ -40,7 +80,7 @@ if uploaded_file:
     )
 
     if st.button("Run Agent"):
-        with st.spinner("Agent planning and executing..."):
+        with st.spinner("Agent planning and executing..."), span("agent.run", "agent", doc_id=doc_id):
             response = agent.invoke({
                 "messages": [
                     {"role": "user", "content": user_goal}
@@ -1,13 +1,60 @@
 import os
 from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_groq import ChatGroq
 
+from utils.tracing import tracer
+
 load_dotenv()
 
+
+class TracingCallback(BaseCallbackHandler):
+    """Records every chat-model request as an "llm" span with token usage."""
+
+    def __init__(self):
+        self._spans = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._spans[run_id] = tracer.start_span(
+            "chat", "llm",
+            model=(kwargs.get("invocation_params") or {}).get("model_name"),
+            messages=sum(len(batch) for batch in messages)
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage:
+            # Streaming responses report usage on the message instead
+            for generations in response.generations:
+                for generation in generations:
+                    message = getattr(generation, "message", None)
+                    metadata = getattr(message, "usage_metadata", None) or {}
+                    usage = {
+                        "prompt_tokens": metadata.get("input_tokens"),
+                        "completion_tokens": metadata.get("output_tokens"),
+                    }
+
+        span.set(
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens")
+        )
+        span.end()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.end(error=error)
+
+
 def get_llm():
     return ChatGroq(
         api_key=os.getenv("GROQ_API_KEY"),
         # model="llama-3.3-70b-versatile",
         model="openai/gpt-oss-20b",
         temperature=0.2,
+        callbacks=[TracingCallback()],
     )
@@ -1,3 +1,10 @@
+import re
+import sys
+from array import array
+from bisect import bisect_right
+from collections import deque
+
+
 def chunk_text(text, chunk_size=500, overlap=100):
     chunks = []
     start = 0
@@ -7,3 +14,175 @@ def chunk_text(text, chunk_size=500, overlap=100):
         start += chunk_size - overlap
 
     return chunks
+
+
+# all-MiniLM-L6-v2 truncates its input at 256 word-piece tokens
+MAX_TOKENS = 256
+OVERLAP_TOKENS = 32
+SPECIAL_TOKENS = 2  # [CLS] and [SEP]
+
+# A sentence ends at . ! or ? (plus closing quotes/brackets) followed by
+# whitespace, or at a line break. "3.5" or "e.g.x" don't end a sentence.
+SENTENCE_RE = re.compile(r"\S.*?(?:[.!?]+[\"')\]]*(?=\s)|(?=\n)|\Z)", re.S)
+
+# Rough stand-in for word-piece tokens when no tokenizer is given
+WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class ChunkSpans:
+    """
+    Chunks stored as (start, end) offsets into the source text.
+
+    Offsets live in two compact int64 arrays and chunk strings are only
+    sliced out of `text` when accessed, so a large document is held in
+    memory once instead of once per overlapping chunk.
+    """
+
+    def __init__(self, text, starts=(), ends=()):
+        self.text = text
+        self.starts = array("q", starts)
+        self.ends = array("q", ends)
+
+    def append(self, start, end):
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def span(self, i):
+        return self.starts[i], self.ends[i]
+
+    @property
+    def nbytes(self):
+        return sys.getsizeof(self.text) + 2 * self.starts.itemsize * len(self.starts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def __iter__(self):
+        for start, end in zip(self.starts, self.ends):
+            yield self.text[start:end]
+
+
+def _token_offsets(texts, tokenizer=None):
+    """Character offsets of every token in each of `texts`."""
+    if not texts:
+        return []
+    if tokenizer is None:
+        return [[m.span() for m in WORD_RE.finditer(text)] for text in texts]
+
+    encoded = tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True)
+    return encoded["offset_mapping"]
+
+
+def _sentence_units(text, offset, tokenizer, budget):
+    """(start, end, n_tokens) per sentence, split further if over budget."""
+    sentences = [m.span() for m in SENTENCE_RE.finditer(text)]
+    token_offsets = _token_offsets([text[s:e] for s, e in sentences], tokenizer)
+
+    units = []
+    for (start, end), tokens in zip(sentences, token_offsets):
+        if len(tokens) <= budget:
+            units.append((offset + start, offset + end, len(tokens)))
+            continue
+
+        # A single sentence longer than the model window: cut between tokens
+        for i in range(0, len(tokens), budget):
+            piece = tokens[i:i + budget]
+            units.append((offset + start + piece[0][0], offset + start + piece[-1][1], len(piece)))
+
+    return units
+
+
+def _pack(units, budget, overlap_tokens):
+    """Greedily pack sentence units into (start, end) chunk spans."""
+    window = deque()
+    total = 0
+    emitted_end = -1
+
+    for unit in units:
+        if window and total + unit[2] > budget:
+            yield window[0][0], window[-1][1]
+            emitted_end = window[-1][1]
+
+            # Carry trailing sentences into the next chunk as overlap, but
+            # always drop at least one so the window moves forward.
+            kept = 0
+            carried = 0
+            for _, _, n_tokens in reversed(window):
+                if (kept == len(window) - 1
+                        or carried + n_tokens > overlap_tokens
+                        or carried + n_tokens + unit[2] > budget):
+                    break
+                kept += 1
+                carried += n_tokens
+
+            for _ in range(len(window) - kept):
+                window.popleft()
+            total = carried
+
+        window.append(unit)
+        total += unit[2]
+
+    if window and window[-1][1] > emitted_end:
+        yield window[0][0], window[-1][1]
+
+
+def _iter_spans(pages, tokenizer, max_tokens, overlap_tokens, separator,
+                page_starts, page_numbers, page_texts):
+    """Chunk spans over `pages`, recording where each page starts."""
+    budget = max_tokens - SPECIAL_TOKENS
+
+    def units():
+        offset = 0
+        for page_number, text in pages:
+            page_starts.append(offset)
+            page_numbers.append(page_number)
+            page_texts.append(text)
+            yield from _sentence_units(text, offset, tokenizer, budget)
+            offset += len(text) + len(separator)
+
+    return _pack(units(), budget, overlap_tokens)
+
+
+def chunk_page_spans(pages, tokenizer=None, max_tokens=MAX_TOKENS,
+                     overlap_tokens=OVERLAP_TOKENS, separator="\n"):
+    """
+    Token-aware, sentence-aligned chunking over (page_number, text) pairs.
+
+    Yields (start, end, first_page, last_page, chunk) as pages arrive,
+    where start/end are offsets into separator.join(page texts). A chunk
+    never exceeds `max_tokens` model tokens including [CLS]/[SEP], and only
+    breaks between sentences unless one sentence alone is over the limit.
+    Without a `tokenizer`, words and punctuation are counted instead.
+    """
+    page_starts = []
+    page_numbers = []
+    page_texts = []
+
+    spans = _iter_spans(pages, tokenizer, max_tokens, overlap_tokens, separator,
+                        page_starts, page_numbers, page_texts)
+
+    for start, end in spans:
+        first = bisect_right(page_starts, start) - 1
+        last = bisect_right(page_starts, end - 1) - 1
+        base = page_starts[first]
+
+        if first == last:
+            chunk = page_texts[first][start - base:end - base]
+        else:
+            chunk = separator.join(page_texts[first:last + 1])[start - base:end - base]
+
+        yield start, end, page_numbers[first], page_numbers[last], chunk
+
+
+def chunk_spans(text, tokenizer=None, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+    """Token-aware, sentence-aligned chunking of one text into ChunkSpans."""
+    spans = ChunkSpans(text)
+    for start, end in _iter_spans([(1, text)], tokenizer, max_tokens, overlap_tokens,
+                                  "", [], [], []):
+        spans.append(start, end)
+    return spans
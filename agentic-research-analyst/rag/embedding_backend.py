@@ -0,0 +1,101 @@
+import os
+import time
+
+import numpy as np
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx | onnx_int8
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))  # 0 = library default
+
+# Where exported / quantized ONNX models are kept between runs
+ONNX_DIR = os.getenv("ONNX_DIR", ".onnx_models")
+
+# Instruction set the int8 kernels target: arm64 | avx2 | avx512 | avx512_vnni
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+
+BACKENDS = ("torch", "onnx", "onnx_int8")
+
+
+def model_id(model_name, backend=EMBEDDING_BACKEND) -> str:
+    """
+    Name to key embedding caches by. Quantized vectors differ slightly from
+    PyTorch ones, so each backend gets its own cache.
+    """
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def load_embedder(model_name, backend=EMBEDDING_BACKEND, threads=EMBED_THREADS, device="cpu"):
+    """
+    SentenceTransformer for `model_name` on the given CPU backend.
+
+    "onnx" runs the exported fp32 graph on ONNX Runtime; "onnx_int8" runs
+    a dynamically quantized copy, exported once into ONNX_DIR. Every
+    backend exposes the same encode(), tokenizer and max_seq_length.
+    `device` applies to the torch backend; ONNX runs on the CPU.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name, device=device)
+
+    model_kwargs = {"provider": "CPUExecutionProvider"}
+    if threads:
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        model_kwargs["session_options"] = options
+
+    if backend == "onnx":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+    path, file_name = _quantized_model(model_name)
+    model_kwargs["file_name"] = file_name
+    return SentenceTransformer(path, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+
+def _quantized_model(model_name):
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    path = os.path.join(ONNX_DIR, model_name.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+
+    if not os.path.exists(os.path.join(path, file_name)):
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save(path)
+        export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, path)
+
+    return path, file_name
+
+
+def parity(reference, candidate) -> dict:
+    """Row-wise cosine similarity between two embedding matrices."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+
+    cosine = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return {
+        "mean_cosine": float(np.mean(cosine)),
+        "min_cosine": float(np.min(cosine)),
+    }
+
+
+def throughput(model, texts, batch_size=EMBED_BATCH_SIZE, repeats=3):
+    """Best-of-`repeats` encoding rate in chunks/sec, plus the embeddings."""
+    model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        best = min(best, time.perf_counter() - start)
+
+    return len(texts) / best, embeddings
@@ -0,0 +1,249 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", ".embedding_cache")
+CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+
+# After an eviction the cache is shrunk to this fraction of `max_bytes`
+# so that every new document doesn't trigger another compaction.
+EVICT_TARGET = 0.8
+
+# SQLite caps the number of ? parameters per statement
+_LOOKUP_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model name, chunk text hash).
+
+    Vectors for one model live in a flat float32 file that is memory-mapped
+    on read. A SQLite index maps each text hash to its row and the time it
+    was last used, and is updated row by row, so a lookup costs the same
+    however large the cache is. When the vector file grows past
+    `max_bytes` the least recently used rows are dropped and the file is
+    compacted.
+
+    Processes may share the directory: every read or write of the vector
+    file happens inside a write transaction on the index, which serializes
+    them, and the row count is re-read from the index each time, so one
+    process never appends against another's stale count.
+    """
+
+    def __init__(self, model_name, cache_dir=CACHE_DIR, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = CACHE_MAX_MB * 1024 * 1024
+
+        self.model_name = model_name
+        self.max_bytes = int(max_bytes)
+        self.dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.sqlite3")
+
+        self.dim = None
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._db = None
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def encode(self, texts, encode_fn):
+        """
+        Return a (len(texts), dim) float32 array of embeddings for `texts`.
+
+        Only texts that are not cached yet are passed to `encode_fn`, which
+        must accept a list of strings and return a 2-D array.
+        """
+        texts = list(texts)
+        keys = [text_hash(text) for text in texts]
+
+        with self._transaction():
+            cached = self._lookup(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        # Encode outside the lock so other sessions can still read the cache.
+        if missing:
+            new_vectors = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            if new_vectors.ndim == 1:
+                new_vectors = new_vectors.reshape(1, -1)
+
+        with self._transaction():
+            if missing:
+                self._append(list(missing), new_vectors)
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+
+            if not keys:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+
+            rows = self._lookup(keys)
+            vectors = self._read_rows([rows[key] for key in keys])
+
+            self.db.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(time.time(), key) for key in rows]
+            )
+            self._evict_if_needed()
+
+        return vectors
+
+    def size_bytes(self) -> int:
+        return self.rows * (self.dim or 0) * 4
+
+    def stats(self) -> dict:
+        with self._transaction():
+            entries = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self.size_bytes()
+        return {
+            "model": self.model_name,
+            "entries": entries,
+            "size_bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self):
+        with self._transaction():
+            self.db.execute("DELETE FROM entries")
+            self._set_shape(None, 0)
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+
+    @property
+    def db(self):
+        # Opened on first use so importing an app never touches the disk
+        if self._db is None:
+            # Transactions are begun explicitly, see _transaction()
+            self._db = sqlite3.connect(self.index_path, timeout=60, isolation_level=None,
+                                       check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    row INTEGER,
+                    last_used REAL
+                )"""
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        return self._db
+
+    # -------------------------------
+    # Storage helpers (call inside _transaction)
+    # -------------------------------
+    @contextmanager
+    def _transaction(self):
+        """Thread lock plus an exclusive write lock on the index."""
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self._load_shape()
+                yield
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def _load_shape(self):
+        meta = dict(self.db.execute("SELECT name, value FROM meta"))
+        self.dim, self.rows = meta.get("dim"), meta.get("rows", 0)
+
+        file_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        expected = self.rows * (self.dim or 0) * 4
+        if file_size > expected:
+            # Rows appended by a writer that died before committing
+            os.truncate(self.vectors_path, expected)
+        elif file_size < expected:
+            # The vector file was lost or cut short; its rows can't be trusted
+            self.db.execute("DELETE FROM entries")
+            self._set_shape(None, 0)
+
+    def _set_shape(self, dim, rows):
+        self.dim, self.rows = dim, rows
+        self.db.executemany(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+            [("dim", dim), ("rows", rows)]
+        )
+
+    def _lookup(self, keys):
+        """{key: row} for the cached ones among `keys`."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[start:start + _LOOKUP_BATCH]
+            found.update(self.db.execute(
+                f"SELECT key, row FROM entries WHERE key IN ({','.join('?' * len(batch))})",
+                batch
+            ))
+        return found
+
+    def _memmap(self):
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                         shape=(self.rows, self.dim))
+
+    def _read_rows(self, rows):
+        # Fancy indexing copies out of the memmap, so the result stays valid
+        # after the file is compacted or replaced.
+        return np.ascontiguousarray(self._memmap()[rows])
+
+    def _append(self, keys, vectors):
+        dim = self.dim
+        if dim is None:
+            dim = int(vectors.shape[1])
+        elif vectors.shape[1] != dim:
+            raise ValueError(
+                f"Embedding dim {vectors.shape[1]} does not match cache dim {dim}"
+            )
+
+        # Another process may have cached some of them while we encoded
+        cached = self._lookup(keys)
+        new = [(key, vector) for key, vector in zip(keys, vectors) if key not in cached]
+        if not new:
+            return
+
+        now = time.time()
+        with open(self.vectors_path, "ab") as f:
+            for _, vector in new:
+                f.write(np.ascontiguousarray(vector).tobytes())
+        self.db.executemany(
+            "INSERT INTO entries VALUES (?, ?, ?)",
+            [(key, self.rows + i, now) for i, (key, _) in enumerate(new)]
+        )
+        self._set_shape(dim, self.rows + len(new))
+
+    def _evict_if_needed(self):
+        if self.size_bytes() <= self.max_bytes:
+            return
+
+        keep_rows = int(self.max_bytes * EVICT_TARGET) // (self.dim * 4)
+        kept = self.db.execute(
+            "SELECT key, row FROM entries ORDER BY last_used DESC LIMIT ?", (keep_rows,)
+        ).fetchall()
+
+        old = self._memmap()
+        compacted = np.ascontiguousarray(old[[row for _, row in kept]])
+        del old
+
+        tmp_path = f"{self.vectors_path}.{os.getpid()}.tmp"
+        compacted.tofile(tmp_path)
+        os.replace(tmp_path, self.vectors_path)
+
+        self.db.execute("UPDATE entries SET row = -1")
+        self.db.executemany(
+            "UPDATE entries SET row = ? WHERE key = ?",
+            [(new_row, key) for new_row, (key, _) in enumerate(kept)]
+        )
+        self.db.execute("DELETE FROM entries WHERE row < 0")
+        self._set_shape(self.dim, len(kept))
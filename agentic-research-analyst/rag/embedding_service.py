@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from rag.embedding_backend import EMBED_BATCH_SIZE
+from utils.tracing import span
+
+EMBED_SERVICE_MAX_BATCH = int(os.getenv("EMBED_SERVICE_MAX_BATCH", "128"))
+EMBED_SERVICE_MAX_WAIT_MS = float(os.getenv("EMBED_SERVICE_MAX_WAIT_MS", "5"))
+
+
+class EmbeddingService:
+    """
+    In-process dynamic batching in front of one embedding model.
+
+    Encode requests from every session are queued and a single worker
+    thread merges them into batches of up to `max_batch` texts, waiting at
+    most `max_wait_ms` after the first request for others to join. Results
+    come back through futures. One worker means one model call at a time,
+    so concurrent sessions don't oversubscribe the CPU with small batches.
+    """
+
+    def __init__(self, model_fn, max_batch=EMBED_SERVICE_MAX_BATCH,
+                 max_wait_ms=EMBED_SERVICE_MAX_WAIT_MS, batch_size=EMBED_BATCH_SIZE):
+        self.model_fn = model_fn  # called in the worker, so the model can load lazily
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batch_size = batch_size
+        self.batch_sizes = deque(maxlen=1000)  # texts per model call, newest last
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, texts) -> Future:
+        """Queue `texts` for encoding; the future resolves to a float32 array."""
+        texts = list(texts)
+        future = Future()
+        if not texts:
+            future.set_result(np.empty((0, 0), dtype=np.float32))
+            return future
+
+        self._ensure_worker()
+        self.requests += 1
+        self._queue.put((texts, future))
+        return future
+
+    def encode(self, texts) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def metrics(self) -> dict:
+        sizes = list(self.batch_sizes)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "requests": self.requests,
+            "batches": len(sizes),
+            "mean_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+            "max_batch_size": max(sizes, default=0),
+        }
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            self._encode_batch(batch, size)
+
+    def _encode_batch(self, batch, size):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        try:
+            with span("encode", "embedding", texts=size, requests=len(batch)):
+                vectors = self.model_fn().encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+                vectors = np.asarray(vectors, dtype=np.float32)
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+
+        self.batch_sizes.append(size)
+        offset = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model) -> EmbeddingService:
+    """Process-wide EmbeddingService for an already loaded model instance."""
+    with _services_lock:
+        if id(model) not in _services:
+            _services[id(model)] = EmbeddingService(lambda: model)
+        return _services[id(model)]
@@ -1,4 +1,11 @@
-from sentence_transformers import SentenceTransformer
+from rag.model_registry import models
+
+MODEL_NAME = "all-MiniLM-L6-v2"
 
 def get_embedder():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+    # One shared instance per process, loaded on first use. EMBEDDING_BACKEND
+    # picks torch / onnx / onnx_int8 (see rag.embedding_backend)
+    return models.get(MODEL_NAME)
+
+def warm_up():
+    return models.warm_up(MODEL_NAME)
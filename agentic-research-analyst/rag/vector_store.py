@@ -1,24 +1,135 @@
+import os
+
+import faiss
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 import numpy as np
 
+from rag.embedding_cache import EmbeddingCache
+from rag.embeddings import MODEL_NAME
+from rag.embedding_backend import EMBED_BATCH_SIZE, EMBEDDING_BACKEND, model_id
+from rag.embedding_service import get_embedding_service
+from rag.query_cache import QueryEmbeddingCache
+
+# "native" indexes float32 arrays directly; "langchain" uses FAISS.from_documents
+VECTOR_STORE = os.getenv("VECTOR_STORE", "native")
+
+# Chunks embedded and indexed per step while the PDF is still streaming in
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", str(EMBED_BATCH_SIZE)))
+
+# Shared by every vector store built in this process
+embedding_cache = EmbeddingCache(model_id(MODEL_NAME, EMBEDDING_BACKEND))
+
 
 class SentenceTransformerEmbeddings(Embeddings):
     """
     LangChain-compatible wrapper around SentenceTransformer.
+
+    Document embeddings go through `cache`, so chunks that were embedded
+    before are read back from disk instead of re-encoded. Query embeddings
+    are kept in a bounded in-memory LRU. Model calls go through the
+    model's shared EmbeddingService, so concurrent sessions are batched.
     """
 
-    def __init__(self, model):
+    def __init__(self, model, cache=None):
         self.model = model
+        self.cache = cache
+        self.service = get_embedding_service(model)
+        self.query_cache = QueryEmbeddingCache(self.service.encode)
 
+    def encode_documents(self, texts) -> np.ndarray:
+        """(len(texts), dim) float32 array, without the list round-trip."""
+        if self.cache is None:
+            return self.service.encode(texts)
+        return self.cache.encode(texts, self.service.encode)
+
+    def encode_queries(self, texts) -> np.ndarray:
+        """Embed several queries with a single forward pass for the misses."""
+        return self.query_cache.encode(texts)
+
+    # LangChain's Embeddings interface wants lists of floats
     def embed_documents(self, texts):
-        vectors = self.model.encode(texts, convert_to_numpy=True)
-        return vectors.tolist()
+        return self.encode_documents(texts).tolist()
 
     def embed_query(self, text):
-        vector = self.model.encode([text], convert_to_numpy=True)[0]
-        return vector.tolist()
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts):
+        return self.encode_queries(texts).tolist()
+
+
+class NativeFaissStore:
+    """
+    FAISS index fed straight from float32 arrays.
+
+    LangChain's FAISS wrapper takes embeddings as Python lists and turns
+    them back into numpy, which on a large document costs more memory than
+    the index itself. Here each batch stays one contiguous float32 array,
+    normalized in place and added to an exact IndexFlatL2. Scores are
+    squared L2 distances between unit vectors, the same scale LangChain's
+    FAISS reports, so rag.adaptive_k applies as is.
+
+    Implements the subset of the LangChain VectorStore interface that the
+    agent tools use.
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.index = None
+        self.documents = []
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add_documents(self, documents):
+        documents = list(documents)
+        vectors = self.embeddings.encode_documents([doc.page_content for doc in documents])
+        self.add_embeddings(documents, vectors)
+
+    def add_embeddings(self, documents, vectors):
+        vectors = _unit_rows(vectors)
+        if self.index is None:
+            self.index = faiss.IndexFlatL2(vectors.shape[1])
+        self.index.add(vectors)
+        self.documents.extend(documents)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4):
+        if self.index is None or not self.documents:
+            return []
+
+        distances, ids = self.index.search(_unit_rows(embedding, copy=True), min(k, len(self.documents)))
+        return [
+            (self.documents[i], float(distance))
+            for i, distance in zip(ids[0], distances[0])
+            if i != -1
+        ]
+
+    def similarity_search_with_score(self, query, k=4):
+        vector = self.embeddings.encode_queries([query])
+        return self.similarity_search_with_score_by_vector(vector, k)
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+
+def _unit_rows(vectors, copy=False):
+    """2-D C-contiguous float32 rows of unit length.
+
+    Normalized in place, so pass copy=True for arrays the caller keeps
+    (e.g. cached query vectors).
+    """
+    if copy:
+        vectors = np.array(vectors, dtype=np.float32, order="C")
+    else:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    faiss.normalize_L2(vectors)
+    return vectors
 
 
 def build_vector_store(chunks, sentence_transformer_model):
@@ -28,9 +139,62 @@ def build_vector_store(chunks, sentence_transformer_model):
 
     documents = [Document(page_content=chunk) for chunk in chunks]
 
-    embeddings = SentenceTransformerEmbeddings(sentence_transformer_model)
+    embeddings = SentenceTransformerEmbeddings(
+        sentence_transformer_model,
+        cache=embedding_cache
+    )
+
+    if VECTOR_STORE == "native":
+        vector_store = NativeFaissStore(embeddings)
+        for start in range(0, len(documents), INDEX_BATCH_SIZE):
+            vector_store.add_documents(documents[start:start + INDEX_BATCH_SIZE])
+        return vector_store
 
     return FAISS.from_documents(
         documents=documents,
         embedding=embeddings
     )
+
+
+def build_vector_store_from_stream(chunk_stream, sentence_transformer_model, batch_size=INDEX_BATCH_SIZE):
+    """
+    Build a FAISS vector store from (chunk, first_page, last_page) items
+    as they arrive.
+
+    Chunks are embedded in batches, so indexing overlaps with PDF
+    extraction. Page numbers are kept in each document's metadata.
+    Returns (vector_store, chunks); vector_store is None for an empty stream.
+    """
+
+    embeddings = SentenceTransformerEmbeddings(
+        sentence_transformer_model,
+        cache=embedding_cache
+    )
+
+    vector_store = NativeFaissStore(embeddings) if VECTOR_STORE == "native" else None
+    chunks = []
+    batch = []
+
+    def flush(vector_store):
+        if vector_store is None:
+            return FAISS.from_documents(documents=batch, embedding=embeddings)
+        vector_store.add_documents(batch)
+        return vector_store
+
+    for chunk, first_page, last_page in chunk_stream:
+        chunks.append(chunk)
+        batch.append(Document(
+            page_content=chunk,
+            metadata={"page": first_page, "last_page": last_page}
+        ))
+
+        if len(batch) >= batch_size:
+            vector_store = flush(vector_store)
+            batch = []
+
+    if batch:
+        vector_store = flush(vector_store)
+
+    if not chunks:
+        vector_store = None
+    return vector_store, chunks
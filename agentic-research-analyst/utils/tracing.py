@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACE_DIR = os.getenv("TRACE_DIR", ".traces")
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(TRACE_DIR, "spans.jsonl"))  # "" disables
+METRICS_FILE = os.getenv("METRICS_FILE", os.path.join(TRACE_DIR, "metrics.prom"))  # "" disables
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = no /metrics endpoint
+
+# Attributes summed into Prometheus counters per (kind, name)
+COUNTED = ("prompt_tokens", "completion_tokens", "chunks", "texts")
+
+logger = logging.getLogger("tracing")
+
+
+class Span:
+    """One timed operation; attributes are added with set()."""
+
+    def __init__(self, tracer, name, kind, parent=None, **attributes):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.error = None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def end(self, error=None):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+            self.error = None if error is None else f"{type(error).__name__}: {error}"
+            self.tracer._record(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Lightweight spans for tool calls, retrievals, embedding batches and
+    LLM requests.
+
+    Spans nest per thread: one started inside another shares its trace id.
+    Every finished span is appended to a JSONL file and folded into
+    per-(kind, name) counters, exported in Prometheus text format to a
+    file and, optionally, an HTTP /metrics endpoint.
+    """
+
+    def __init__(self, path=TRACE_FILE, metrics_path=METRICS_FILE):
+        self.path = path
+        self.metrics_path = metrics_path
+        self._metrics = defaultdict(lambda: defaultdict(float))  # (kind, name) -> counters
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._server = None
+
+    @contextmanager
+    def span(self, name, kind, **attributes):
+        span = self.start_span(name, kind, **attributes)
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.end(error=exc)
+            raise
+        finally:
+            stack.pop()
+            span.end()
+
+    def start_span(self, name, kind, **attributes) -> Span:
+        """A span ended explicitly with end(), e.g. from callbacks."""
+        stack = self._stack()
+        return Span(self, name, kind, parent=stack[-1] if stack else None, **attributes)
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP span_duration_seconds Time spent in traced operations.",
+            "# TYPE span_duration_seconds summary",
+        ]
+        with self._lock:
+            metrics = {key: dict(counters) for key, counters in self._metrics.items()}
+
+        for (kind, name), counters in sorted(metrics.items()):
+            labels = f'kind="{kind}",name="{name}"'
+            lines.append(f"span_duration_seconds_sum{{{labels}}} {counters['seconds']:.6f}")
+            lines.append(f"span_duration_seconds_count{{{labels}}} {int(counters['count'])}")
+            lines.append(f"span_errors_total{{{labels}}} {int(counters['errors'])}")
+            for attribute in COUNTED:
+                if attribute in counters:
+                    lines.append(f"span_{attribute}_total{{{labels}}} {int(counters[attribute])}")
+
+        return "\n".join(lines) + "\n"
+
+    def serve_metrics(self, port=METRICS_PORT, host="127.0.0.1"):
+        """Serve prometheus() at http://host:port/metrics (once per process)."""
+        if not port or self._server is not None:
+            return self._server
+
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        return self._server
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, span):
+        record = span.to_dict()
+        logger.debug("%s %s %.1fms %s", span.kind, span.name, record["duration_ms"], span.attributes)
+
+        with self._lock:
+            counters = self._metrics[(span.kind, span.name)]
+            counters["count"] += 1
+            counters["seconds"] += span.duration
+            counters["errors"] += span.error is not None
+            for attribute in COUNTED:
+                value = span.attributes.get(attribute)
+                if isinstance(value, (int, float)):
+                    counters[attribute] += value
+
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+
+        if self.metrics_path:
+            self._write_metrics()
+
+    def _write_metrics(self):
+        os.makedirs(os.path.dirname(self.metrics_path) or ".", exist_ok=True)
+        tmp_path = f"{self.metrics_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, self.metrics_path)
+
+
+# Shared by every module in the process
+tracer = Tracer()
+span = tracer.span
@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-from groq import Groq
+from shared.llm_client import get_groq_client
 
 # Load environment variables
 load_dotenv()
@@ -10,16 +10,16 @@ if not api_key:
     raise ValueError("GROQ_API_KEY not found in .env")
 print("Loaded GROQ_API_KEY:", api_key)
 
-# Create Groq client
-client = Groq(api_key=api_key)
+# Shared, pooled Groq client
+client = get_groq_client(api_key)
 
 prompt = """
 Generate clean Python code for:
 print the Fibonacci sequence up to n terms, where n is 10.
 """
 
-response = client.chat.completions.create(
-    model=os.getenv('model', 'groq/compound-mini'),
+content = client.chat(
+    os.getenv('model', 'groq/compound-mini'),
     messages=[
         {"role": "system", "content": "You are a senior software engineer."},
         {"role": "user", "content": prompt}
@@ -27,4 +27,4 @@ response = client.chat.completions.create(
     temperature=0.2
 )
 
-print(response.choices[0].message.content)
+print(content)
@@ -0,0 +1,47 @@
+import os
+
+RETRIEVE_K_MIN = int(os.getenv("RETRIEVE_K_MIN", "2"))
+# The fixed k retrieval used before; adaptive retrieval only ever sends fewer
+RETRIEVE_K_MAX = int(os.getenv("RETRIEVE_K_MAX", "5"))
+
+# Squared L2 between unit-length embeddings is 2 - 2 * cosine, so 1.4
+# drops chunks with cosine similarity below 0.3 to the query.
+RETRIEVE_MAX_DISTANCE = float(os.getenv("RETRIEVE_MAX_DISTANCE", "1.4"))
+
+# Stop once a chunk is this much further from the query than the best one
+RETRIEVE_MAX_GAP = float(os.getenv("RETRIEVE_MAX_GAP", "0.35"))
+
+
+def adaptive_cutoff(distances, k_min=RETRIEVE_K_MIN, k_max=RETRIEVE_K_MAX,
+                    max_distance=RETRIEVE_MAX_DISTANCE, max_gap=RETRIEVE_MAX_GAP):
+    """
+    How many of the nearest-first `distances` to keep, and why it stopped.
+
+    At least `k_min` and at most `k_max` results are kept. Past `k_min`,
+    retrieval stops at the first result further than `max_distance` from
+    the query ("distance") or more than `max_gap` further than the best
+    result ("gap"); otherwise it stops at "k_max", or at "exhausted" when
+    fewer results exist. Unknown (None/NaN) distances, e.g. keyword-only
+    hits, never trigger a cutoff.
+    """
+    n = min(len(distances), k_max)
+
+    # Fused (hybrid) rankings aren't sorted by distance, so the best match
+    # may not come first
+    known = [d for d in distances[:n] if _known(d)]
+    best = min(known) if known else None
+
+    for i in range(min(k_min, n), n):
+        distance = distances[i]
+        if not _known(distance):
+            continue
+        if distance > max_distance:
+            return i, "distance"
+        if distance - best > max_gap:
+            return i, "gap"
+
+    return n, "k_max" if len(distances) >= k_max else "exhausted"
+
+
+def _known(distance):
+    return distance is not None and distance == distance
@@ -1,11 +1,18 @@
+import math
+
 import streamlit as st
 
-from pdf_loader import extract_text_from_pdf
-from chunker import chunk_text
-from embeddings import build_vector_store
-from rag import retrieve_chunks
-from llm import generate_answer
+from embeddings import warm_up
+from ingest import ingest_pdf
+from rag import query_cache, retrieve_chunk_ids_adaptive
+from llm import response_cache, stream_answer
 from prompt import build_rag_prompt
+from context_packer import pack_context
+from lexical_index import is_keyword_query
+from doc_registry import document_id, registry
+
+# Distance assumed for chunks matched by BM25 alone (confidence 0.5)
+LEXICAL_ONLY_DISTANCE = 1.0
 
 def context_coverage_score(answer: str, context: str) -> float:
     answer_tokens = set(answer.lower().split())
@@ -33,6 +40,9 @@ st.markdown(
 
 st.divider()
 
+# The embedding model loads in the background while a file is picked
+warm_up()
+
 # -------------------------------
 # File upload
 # -------------------------------
@@ -46,13 +56,25 @@ uploaded_file = st.file_uploader(
 # -------------------------------
 if uploaded_file is not None:
 
-    # Step 1: Extract + clean text
-    with st.spinner("Extracting text from PDF..."):
-        text = extract_text_from_pdf(uploaded_file)
+    # Reruns and other sessions reuse an already ingested document
+    doc_id = document_id(uploaded_file.getvalue())
+    doc = registry.get(doc_id)
+
+    if doc is None:
 
-    if not text.strip():
-        st.error("No readable text found in the PDF.")
-        st.stop()
+        # Steps 1-3: Extract + clean, chunk and index, streamed page by page
+        with st.spinner("Extracting, chunking and indexing PDF..."):
+            doc = ingest_pdf(uploaded_file)
+
+        if not doc["chunks"]:
+            st.error("No readable text found in the PDF.")
+            st.stop()
+
+        registry.put(doc_id, doc)
+
+    text = doc["text"]
+    chunks = doc["chunks"]
+    index = doc["index"]
 
     # Preview extracted text
     st.subheader("📄 Extracted Text Preview")
@@ -60,18 +82,10 @@ if uploaded_file is not None:
 
     st.divider()
 
-    # Step 2: Chunk text
-    with st.spinner("Chunking document..."):
-        chunks = chunk_text(text)
-
     st.write(f"🔹 Total chunks created: **{len(chunks)}**")
 
     st.divider()
 
-    # Step 3: Build vector store
-    with st.spinner("Building vector index..."):
-        index, _ = build_vector_store(chunks)
-
     # -------------------------------
     # Question input
     # -------------------------------
@@ -84,17 +98,25 @@ if uploaded_file is not None:
 
         # Step 4: Retrieve relevant chunks
         with st.spinner("Retrieving relevant context..."):
-            retrieved_chunks, distances = retrieve_chunks(
+            # Between RETRIEVE_K_MIN and RETRIEVE_K_MAX chunks, fewer when the tail is poor
+            chunk_ids, distances, stop_reason = retrieve_chunk_ids_adaptive(
                 query=question,
                 index=index,
-                chunks=chunks,
-                k=5
+                lexical=doc.get("lexical")
             )
+        retrieved_chunks = [chunks[i] for i in chunk_ids]
+
+        # Overlapping neighbours are merged and the total kept within budget
+        context = pack_context((chunks, i) for i in chunk_ids)
 
-        context = "\n\n".join(retrieved_chunks)
-        
-        avg_distance = sum(distances) / len(distances)
-        retrieval_confidence = 1 / (1 + avg_distance)
+        # Chunks found only by keyword match have no vector distance and
+        # count as LEXICAL_ONLY_DISTANCE: no evidence either way, never an
+        # exact match
+        if len(distances):
+            avg_distance = sum(LEXICAL_ONLY_DISTANCE if math.isnan(d) else d for d in distances) / len(distances)
+            retrieval_confidence = 1 / (1 + avg_distance)
+        else:
+            retrieval_confidence = 0.0
 
         # Step 5: Build grounded prompt (FROM prompt.py)
         prompt = build_rag_prompt(
@@ -102,9 +124,28 @@ if uploaded_file is not None:
             question=question
         )
 
-        # Step 6: Generate answer
+        # Near-identical questions about this document reuse a cached answer;
+        # keyword lookups skipped the embedder, so they only hit exact prompts
+        question_vector = None if is_keyword_query(question) else query_cache.encode([question])[0]
+        # This answer's own timing; other sessions' calls never land here
+        timing = {}
+
+        # Step 6: Generate answer, streamed into the page as tokens arrive
+        st.subheader("📌 Answer")
         with st.spinner("Generating answer..."):
-            answer = generate_answer(prompt)
+            answer = st.write_stream(
+                stream_answer(prompt, scope=doc_id, question_vector=question_vector, stats=timing)
+            ).strip()
+
+        if not timing:
+            # No LLM call was made
+            st.caption(f"Answered from cache · hit rate {response_cache.stats()['hit_rate']:.0%}")
+        elif timing["ttft_s"] is not None and timing["tokens_per_s"]:
+            st.caption(
+                f"First token after {timing['ttft_s']:.2f}s · "
+                f"{timing['tokens_per_s']:.1f} tokens/s"
+            )
+
         coverage_score = context_coverage_score(answer, context)
         trust_score = (
             0.7 * retrieval_confidence +
@@ -114,11 +155,8 @@ if uploaded_file is not None:
 
 
         # -------------------------------
-        # Display answer
+        # Display answer confidence
         # -------------------------------
-        st.subheader("📌 Answer")
-        st.write(answer)
-
         st.subheader("📊 Answer Confidence")
 
         col1, col2, col3 = st.columns(3)
@@ -148,6 +186,7 @@ if uploaded_file is not None:
 
         # Optional: show retrieved chunks
         with st.expander("🔍 View retrieved context"):
+            st.caption(f"{len(retrieved_chunks)} chunks retrieved (stopped on: {stop_reason})")
             for i, chunk in enumerate(retrieved_chunks, start=1):
                 st.markdown(f"**Chunk {i}:**")
                 st.write(chunk)
@@ -0,0 +1,104 @@
+import os
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+# Rough LLM token size; the prompt model's tokenizer isn't loaded here
+CHARS_PER_TOKEN = 4
+
+# Shortest suffix/prefix match treated as chunk overlap in plain lists
+MIN_OVERLAP_CHARS = 16
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_context(hits, token_budget=CONTEXT_TOKEN_BUDGET, separator="\n\n"):
+    """
+    Assemble retrieved chunks into one prompt context.
+
+    `hits` are (chunks, position) pairs, most relevant first, where
+    `chunks` is a document's chunk store. Chunks are taken by relevance
+    while the assembled context fits `token_budget`; the kept chunks are
+    put back in document order and overlapping or adjacent ones are merged
+    so shared text is only sent once. The most relevant chunk is always
+    kept, cut to the budget if needed.
+    """
+    selected = []
+    seen = set()
+
+    for chunks, position in hits:
+        key = (id(chunks), position)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        candidate = selected + [(chunks, position)]
+        if selected and estimate_tokens(_assemble(candidate, separator)) > token_budget:
+            continue
+        selected = candidate
+
+    context = _assemble(selected, separator)
+    return context[:token_budget * CHARS_PER_TOKEN]
+
+
+def _assemble(hits, separator):
+    # Group by document, documents in order of their best hit
+    documents = {}
+    for chunks, position in hits:
+        documents.setdefault(id(chunks), (chunks, []))[1].append(position)
+
+    segments = []
+    for chunks, positions in documents.values():
+        positions = sorted(positions)
+        if hasattr(chunks, "span"):
+            segments.extend(_merge_spans(chunks, positions))
+        else:
+            segments.extend(_merge_texts(chunks, positions))
+
+    return separator.join(segments)
+
+
+def _merge_spans(chunks, positions):
+    """Merge chunks by their offsets into the source text (ChunkSpans)."""
+    merged = []
+    for position in positions:
+        start, end = chunks.span(position)
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    return [chunks.text[start:end] for start, end in merged]
+
+
+def _merge_texts(chunks, positions):
+    """Merge neighbouring chunks of a plain list, dropping repeated overlap."""
+    segments = []
+    previous = None
+    for position in positions:
+        chunk = chunks[position]
+        if previous is not None and position == previous + 1:
+            overlap = _overlap(segments[-1], chunk)
+            joiner = "" if overlap else " "
+            segments[-1] += joiner + chunk[overlap:]
+        else:
+            segments.append(chunk)
+        previous = position
+
+    return segments
+
+
+def _overlap(left, right):
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    anchor = right[:MIN_OVERLAP_CHARS]
+    if len(anchor) < MIN_OVERLAP_CHARS:
+        return 0
+
+    start = left.find(anchor, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(anchor, start + 1)
+
+    return 0
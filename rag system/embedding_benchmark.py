@@ -0,0 +1,84 @@
+"""
+Throughput and parity of the ONNX embedding backends against PyTorch.
+
+    python embedding_benchmark.py --pdf report.pdf
+    python embedding_benchmark.py --backends torch onnx_int8 --threads 4 --min-cosine 0.98
+"""
+import argparse
+import json
+import sys
+
+from chunker import chunk_spans
+from embedding_backend import BACKENDS, EMBED_BATCH_SIZE, EMBED_THREADS, load_embedder, parity, throughput
+
+SAMPLE_SENTENCES = [
+    "Revenue grew by twelve percent compared with the previous quarter.",
+    "The committee recommends phasing out the legacy billing system by 2026.",
+    "Clause 4.2 allows either party to terminate with ninety days notice.",
+    "Customer churn was concentrated in the small business segment.",
+    "Supply chain delays increased average delivery times by four days.",
+    "The pilot reduced manual review effort without affecting accuracy.",
+]
+
+
+def sample_chunks(pdf_path, tokenizer, max_tokens, n):
+    if not pdf_path:
+        return [" ".join(SAMPLE_SENTENCES[i % 6:] + SAMPLE_SENTENCES[:i % 6]) for i in range(n)]
+
+    from pdf_loader import extract_text_from_pdf
+
+    with open(pdf_path, "rb") as f:
+        text = extract_text_from_pdf(f)
+    chunks = list(chunk_spans(text, tokenizer=tokenizer, max_tokens=max_tokens))
+    return chunks[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pdf", help="take chunks from this PDF instead of sample sentences")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--n", type=int, default=512, help="number of chunks to encode")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=EMBED_THREADS)
+    parser.add_argument("--min-cosine", type=float, default=0.98,
+                        help="fail if any backend's worst cosine to PyTorch is below this")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    reference_model = load_embedder(args.model, "torch", args.threads)
+    texts = sample_chunks(args.pdf, reference_model.tokenizer, reference_model.max_seq_length, args.n)
+    reference_rate, reference = throughput(reference_model, texts, args.batch_size)
+
+    report = []
+    for backend in args.backends:
+        if backend == "torch":
+            rate, embeddings = reference_rate, reference
+        else:
+            rate, embeddings = throughput(load_embedder(args.model, backend, args.threads), texts, args.batch_size)
+
+        report.append({
+            "backend": backend,
+            "chunks_per_s": round(rate, 1),
+            "speedup": round(rate / reference_rate, 2),
+            **{key: round(value, 5) for key, value in parity(reference, embeddings).items()},
+        })
+
+    print(f"{len(texts)} chunks, batch size {args.batch_size}, threads {args.threads or 'default'}")
+    print(f"{'backend':<12}{'chunks/s':>10}{'speedup':>9}{'mean cos':>10}{'min cos':>10}")
+    for row in report:
+        print(f"{row['backend']:<12}{row['chunks_per_s']:>10}{row['speedup']:>9}"
+              f"{row['mean_cosine']:>10}{row['min_cosine']:>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failed = [row["backend"] for row in report if row["min_cosine"] < args.min_cosine]
+    if failed:
+        print(f"parity below {args.min_cosine}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
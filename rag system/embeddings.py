@@ -1,14 +1,69 @@
-from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+from embedding_cache import EmbeddingCache
+from embedding_backend import EMBED_BATCH_SIZE, EMBEDDING_BACKEND, model_id
+from model_registry import models
+from embedding_service import EmbeddingService
+from index_factory import INDEX_TYPE, build_index, upgrade_index
 
-def build_vector_store(chunks):
-    embeddings = model.encode(chunks, convert_to_numpy=True)
+MODEL_NAME = "all-MiniLM-L6-v2"
 
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
+embedding_cache = EmbeddingCache(model_id(MODEL_NAME, EMBEDDING_BACKEND))
+
+def get_embedder():
+    """
+    The shared embedding model, loaded on first use rather than at import.
+
+    PyTorch by default; EMBEDDING_BACKEND=onnx_int8 for quantized CPU
+    inference.
+    """
+    return models.get(MODEL_NAME)
+
+def warm_up():
+    """Start loading the model in the background (no-op once loaded)."""
+    return models.warm_up(MODEL_NAME)
+
+# Encode calls from every session are batched together on one worker
+embedding_service = EmbeddingService(get_embedder)
+
+def encode_chunks(chunks):
+    # Only chunks that were never embedded before go through the model
+    return embedding_cache.encode(chunks, embedding_service.encode)
+
+def build_vector_store(chunks, index_type=INDEX_TYPE):
+    embeddings = encode_chunks(chunks)
+
+    # Flat, HNSW or IVF depending on corpus size (see index_factory)
+    index = build_index(embeddings, kind=index_type)
 
     return index, embeddings
+
+def build_vector_store_from_stream(chunk_stream, batch_size=EMBED_BATCH_SIZE, index_type=INDEX_TYPE):
+    """
+    Embed and index chunk strings in batches as they arrive.
+
+    Batches go into a flat index; once the stream ends and the corpus size
+    is known it is swapped for the backend index_factory picks.
+    Returns None if the stream was empty.
+    """
+    index = None
+    batch = []
+
+    def flush(index):
+        embeddings = encode_chunks(batch)
+        if index is None:
+            index = faiss.IndexFlatL2(embeddings.shape[1])
+        index.add(embeddings)
+        batch.clear()
+        return index
+
+    for chunk in chunk_stream:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            index = flush(index)
+
+    if batch:
+        index = flush(index)
+
+    return upgrade_index(index, kind=index_type)
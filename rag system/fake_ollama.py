@@ -0,0 +1,110 @@
+"""
+Stand-in for Ollama's /api/generate with a configurable latency and token rate.
+
+    python fake_ollama.py --port 11435 --latency-ms 400 --tokens-per-s 25
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = (
+    "Based on the provided context the document states that the findings "
+    "are supported by the reported figures and the recommendations follow "
+    "from them ."
+).split()
+
+
+class FakeOllamaServer:
+    """
+    Local NDJSON server that answers like Ollama without running a model.
+
+    Each request waits `latency_ms` (prompt evaluation / queueing), then
+    streams `num_tokens` tokens at `tokens_per_s`. The final message
+    carries Ollama's timing fields, so OllamaClient records the same stats
+    it would against a real server.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=300, tokens_per_s=25, num_tokens=64):
+        self.latency = latency_ms / 1000
+        self.token_interval = 1 / tokens_per_s if tokens_per_s else 0
+        self.num_tokens = num_tokens
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                fake.requests += 1
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+
+                time.sleep(fake.latency)
+                start = time.perf_counter()
+                for i in range(fake.num_tokens):
+                    time.sleep(fake.token_interval)
+                    self._send({"model": body.get("model"), "response": FILLER[i % len(FILLER)] + " ", "done": False})
+
+                self._send({
+                    "model": body.get("model"),
+                    "response": "",
+                    "done": True,
+                    "prompt_eval_count": len(body.get("prompt", "")) // 4,
+                    "eval_count": fake.num_tokens,
+                    "eval_duration": int((time.perf_counter() - start) * 1e9),
+                })
+
+            def _send(self, message):
+                self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-s", type=float, default=25)
+    parser.add_argument("--num-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.host, args.port, args.latency_ms, args.tokens_per_s, args.num_tokens)
+    print(f"Fake Ollama listening on {server.url}")
+    server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Recall@k versus search latency of the ANN backends against flat search.
+
+    python index_benchmark.py --n 200000 --queries 200
+    python index_benchmark.py --from-cache .embedding_cache/all-MiniLM-L6-v2
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from index_factory import INDEX_TARGET, choose_index_type, recall_latency_report
+
+
+def synthetic_embeddings(n, dim, n_clusters=256, seed=0):
+    # Clustered, L2-normalised vectors look far more like sentence
+    # embeddings than uniform noise does.
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, n_clusters, n)]
+    vectors += 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def cached_embeddings(cache_dir):
+    with open(os.path.join(cache_dir, "index.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return np.fromfile(os.path.join(cache_dir, "vectors.f32"), dtype=np.float32).reshape(
+        meta["rows"], meta["dim"]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=100_000, help="corpus size for synthetic vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--target", default=INDEX_TARGET, choices=["recall", "balanced", "latency"])
+    parser.add_argument("--from-cache", help="use vectors from an embedding cache directory")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.from_cache:
+        corpus = cached_embeddings(args.from_cache)
+    else:
+        corpus = synthetic_embeddings(args.n, args.dim)
+
+    # Queries are perturbed corpus points, like a question close to a chunk
+    rng = np.random.default_rng(1)
+    queries = corpus[rng.integers(0, len(corpus), args.queries)].copy()
+    queries += 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    report = recall_latency_report(corpus, queries, k=args.k, target=args.target)
+
+    print(f"{len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, "
+          f"target={args.target}, auto -> {choose_index_type(len(corpus), args.target)}")
+    print(f"{'index':<16}{'build s':>10}{'mean ms':>10}{'p95 ms':>10}{f'recall@{args.k}':>12}")
+    for row in report:
+        print(f"{row['index']:<16}{row['build_s']:>10}{row['mean_ms']:>10}"
+              f"{row['p95_ms']:>10}{row[f'recall@{args.k}']:>12}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
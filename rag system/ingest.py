@@ -0,0 +1,54 @@
+from pdf_loader import iter_pages, clean_text
+from chunker import ChunkSpans, chunk_page_spans
+from embeddings import build_vector_store_from_stream, get_embedder
+from lexical_index import LexicalIndex
+
+PAGE_SEPARATOR = "\n"
+
+def ingest_pdf(file) -> dict:
+    """
+    Extract, chunk, embed and index a PDF as one streaming pipeline.
+
+    Pages come off a process pool in order, so the first chunks are
+    embedded while later pages are still being extracted. Chunks are
+    sized in the embedding model's own tokens and kept as offsets into
+    the document text. A BM25 index is filled from the same stream.
+    """
+    model = get_embedder()
+    page_texts = []
+    spans = []
+    lexical = LexicalIndex()
+
+    def cleaned_pages():
+        for page_number, page_text in iter_pages(file):
+            page_text = clean_text(page_text)
+            page_texts.append(page_text)
+            yield page_number, page_text
+
+    def chunk_stream():
+        for start, end, first_page, last_page, chunk in chunk_page_spans(
+            cleaned_pages(),
+            tokenizer=model.tokenizer,
+            max_tokens=model.max_seq_length,
+            separator=PAGE_SEPARATOR
+        ):
+            spans.append((start, end, first_page, last_page))
+            lexical.add(chunk)
+            yield chunk
+
+    index = build_vector_store_from_stream(chunk_stream())
+
+    text = PAGE_SEPARATOR.join(page_texts)
+    chunks = ChunkSpans(
+        text,
+        [span[0] for span in spans],
+        [span[1] for span in spans]
+    )
+
+    return {
+        "text": text,
+        "chunks": chunks,
+        "chunk_pages": [(span[2], span[3]) for span in spans],
+        "index": index,
+        "lexical": lexical
+    }
@@ -0,0 +1,142 @@
+import math
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# Keeps identifiers such as "4.2.1", "ab-1234" or "s3://bucket" whole
+TOKEN_RE = re.compile(r"\w+(?:[-./:]\w+)*")
+
+# A token that looks like a code or number rather than a word
+IDENTIFIER_RE = re.compile(r"\d|[A-Z]{2,}|\w[-./:]\w")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how in is it of on or "
+    "that the this to was what when where which who why with".split()
+)
+
+# Any of these makes a query a question for the embedder, however short
+QUESTION_WORDS = frozenset(
+    "what when where which who whom whose why how "
+    "explain describe summarize summarise compare list".split()
+)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Standard RRF damping constant; larger flattens the rank weighting
+RRF_K = 60
+
+# Queries with more terms than this always go through the embedder
+KEYWORD_MAX_TERMS = 4
+
+
+def tokenize(text: str) -> list:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 inverted index over a document's chunks.
+
+    Each term's postings are two int arrays (chunk positions and term
+    frequencies), appended in position order as chunks arrive, so the
+    index can be filled from the same stream that feeds the embedder and
+    scored with vectorized numpy over the raw buffers.
+    """
+
+    def __init__(self, texts=()):
+        self.postings = {}  # term -> (positions, frequencies)
+        self.lengths = array("i")
+        self.total_length = 0
+        self.extend(texts)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, text) -> int:
+        position = len(self.lengths)
+        counts = Counter(tokenize(text))
+
+        for term, frequency in counts.items():
+            entry = self.postings.get(term)
+            if entry is None:
+                entry = self.postings[term] = (array("i"), array("i"))
+            entry[0].append(position)
+            entry[1].append(frequency)
+
+        length = sum(counts.values())
+        self.lengths.append(length)
+        self.total_length += length
+        return position
+
+    def extend(self, texts):
+        for text in texts:
+            self.add(text)
+
+    def search(self, query, k=5):
+        """Top-k (position, score) pairs by BM25, best first; only chunks matching a term."""
+        n = len(self.lengths)
+        terms = set(tokenize(query))
+        if not n or not terms:
+            return []
+
+        lengths = np.frombuffer(self.lengths, dtype=np.intc)
+        average_length = self.total_length / n or 1.0
+        scores = np.zeros(n, dtype=np.float32)
+
+        for term in terms:
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+
+            positions = np.frombuffer(entry[0], dtype=np.intc)
+            frequencies = np.frombuffer(entry[1], dtype=np.intc).astype(np.float32)
+            idf = math.log(1 + (n - len(positions) + 0.5) / (len(positions) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[positions] / average_length)
+            scores[positions] += idf * frequencies * (BM25_K1 + 1) / (frequencies + norm)
+
+        matched = np.flatnonzero(scores)
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(int(i), float(scores[i])) for i in top]
+
+    @property
+    def nbytes(self):
+        postings = sum(
+            positions.itemsize * len(positions) * 2
+            for positions, _ in self.postings.values()
+        )
+        return postings + self.lengths.itemsize * len(self.lengths)
+
+
+def is_keyword_query(query: str) -> bool:
+    """
+    True for short lookups of codes, numbers or quoted phrases, which
+    BM25 answers well on its own so the embedder can be skipped.
+
+    Questions ("What is GDP?") never qualify, and most of the remaining
+    non-stopword terms must look like identifiers, so "Revenue in 2023"
+    still goes through dense retrieval while "ISO-27001 clause 4.2" does not.
+    """
+    query = query.strip()
+    terms = TOKEN_RE.findall(query)
+    if not terms or len(terms) > KEYWORD_MAX_TERMS:
+        return False
+    if len(query) > 1 and query[0] == query[-1] == '"':
+        return True
+    if any(term.lower() in QUESTION_WORDS for term in terms):
+        return False
+
+    content = [term for term in terms if term.lower() not in STOPWORDS]
+    identifiers = sum(1 for term in content if IDENTIFIER_RE.search(term))
+    return identifiers * 2 > len(content)
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse several best-first rankings of ids into one, best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
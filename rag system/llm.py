@@ -19,26 +19,55 @@
 
 
 
-import requests
-import json
+import os
+import sys
+
+# Shared with the other apps, from the repo root (see shared/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.llm_client import get_ollama_client
+from shared.response_cache import ResponseCache
 
 OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "llama3:latest"
+OPTIONS = {
+    "temperature": 0.1
+}
+
+# Shared keep-alive pool and concurrency limit for every Ollama call
+client = get_ollama_client(OLLAMA_URL)
+
+# Latency stats of recent calls, newest last
+call_stats = client.call_stats
+
+# Re-asked questions and Streamlit reruns are answered from disk
+response_cache = ResponseCache()
+
+def generate_answer(prompt: str, scope=None, question_vector=None) -> str:
+    """
+    Answer `prompt`, reusing a cached answer when possible.
 
-def generate_answer(prompt: str) -> str:
-    payload = {
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": 0.1
-        }
-    }
+    With a `scope` (document id) and the question's embedding, an answer
+    to a near-identical question about the same document is reused too.
+    """
+    return response_cache.cached(
+        MODEL_NAME, OPTIONS["temperature"], prompt,
+        lambda: client.generate(MODEL_NAME, prompt, OPTIONS),
+        scope, question_vector
+    )
 
-    response = requests.post(OLLAMA_URL, json=payload)
+def stream_answer(prompt: str, scope=None, question_vector=None, stats=None):
+    """
+    Yield the answer token by token from Ollama's NDJSON stream.
 
-    if response.status_code != 200:
-        raise RuntimeError(f"Ollama error: {response.text}")
+    Time-to-first-token and tokens/sec go into the `stats` dict (and
+    `call_stats`) once the stream finishes. A cached answer is yielded
+    in one piece and makes no call, leaving `stats` empty.
+    """
+    return response_cache.cached_stream(
+        MODEL_NAME, OPTIONS["temperature"], prompt,
+        lambda: client.stream(MODEL_NAME, prompt, OPTIONS, stats),
+        scope, question_vector
+    )
 
-    result = response.json()
-    return result["response"].strip()
+async def agenerate_answer(prompt: str) -> str:
+    return await client.agenerate(MODEL_NAME, prompt, OPTIONS)
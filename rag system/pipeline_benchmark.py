@@ -0,0 +1,242 @@
+"""
+Per-stage timings of the RAG pipeline, run headless against a fake Ollama.
+
+    python pipeline_benchmark.py --pages 50 --runs 5
+    python pipeline_benchmark.py --pages 200 --latency-ms 800 --tokens-per-s 15 --json bench/after.json
+    python pipeline_benchmark.py --pages 50 --compare bench/before.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import faiss
+import numpy as np
+
+import rag
+from chunker import ChunkSpans, chunk_page_spans
+from context_packer import pack_context
+from embeddings import embedding_service, encode_chunks, get_embedder
+from fake_ollama import FakeOllamaServer
+from index_factory import build_index
+from ingest import PAGE_SEPARATOR
+from lexical_index import LexicalIndex
+from llm import MODEL_NAME, OPTIONS
+from pdf_loader import clean_text, iter_pages
+from prompt import build_rag_prompt
+
+# Shared with the other apps, from the repo root (see shared/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.llm_client import OllamaClient
+
+STAGES = ("extract", "clean", "chunk", "embed", "index", "retrieve", "prompt", "generate")
+
+VOCABULARY = (
+    "revenue growth margin customer churn segment quarter forecast risk "
+    "mitigation supplier delivery contract clause termination notice audit "
+    "compliance policy region market share pricing discount inventory "
+    "logistics capacity hiring retention training incident outage latency "
+    "platform migration roadmap budget variance target baseline pilot "
+    "rollout stakeholder board committee recommendation finding evidence "
+    "survey respondents increased decreased remained stable improved "
+    "declined significantly slightly across during within compared with "
+    "the a of to and in for on by from that this which was were is are"
+).split()
+
+QUESTIONS = [
+    "Summarize the main findings in less than 100 words",
+    "What risks are mentioned and how are they mitigated?",
+    "How did revenue and margin change across quarters?",
+    "What does the termination clause say?",
+    "What are the recommendations of the committee?",
+]
+
+
+def synthetic_pdf(pages, words_per_page=400, seed=0) -> bytes:
+    """A minimal multi-page PDF of report-like sentences in Helvetica."""
+    rng = random.Random(seed)
+
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+    bodies = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    for page in range(pages):
+        words = []
+        while len(words) < words_per_page:
+            sentence = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 20))]
+            sentence[0] = sentence[0].capitalize()
+            sentence[-1] += f" {rng.randint(1, 99)}%." if rng.random() < 0.3 else "."
+            words.extend(sentence)
+
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        stream = ("BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET").encode("latin-1")
+
+        bodies.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * page} 0 R >>".encode()
+        )
+        bodies.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(bodies, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(bodies) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(bodies) + 1, xref)
+    return bytes(out)
+
+
+def run_once(pdf_bytes, questions, llm, embed_fn, samples):
+    """One pass over every stage; appends per-stage seconds to `samples`."""
+    model = get_embedder()
+
+    def timed(stage, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        samples[stage].append(time.perf_counter() - start)
+        return result
+
+    pages = timed("extract", lambda: list(iter_pages(io.BytesIO(pdf_bytes))))
+    pages = timed("clean", lambda: [(number, clean_text(text)) for number, text in pages])
+
+    spans = timed("chunk", lambda: list(chunk_page_spans(
+        pages,
+        tokenizer=model.tokenizer,
+        max_tokens=model.max_seq_length,
+        separator=PAGE_SEPARATOR
+    )))
+    texts = [span[4] for span in spans]
+    chunks = ChunkSpans(
+        PAGE_SEPARATOR.join(text for _, text in pages),
+        [span[0] for span in spans],
+        [span[1] for span in spans]
+    )
+
+    embeddings = timed("embed", embed_fn, texts)
+    index, lexical = timed("index", lambda: (build_index(embeddings, cache_dir=None), LexicalIndex(texts)))
+
+    ttfts = []
+    for question in questions:
+        chunk_ids, _, _ = timed("retrieve", rag.retrieve_chunk_ids_adaptive, question, index, lexical)
+        prompt = timed("prompt", lambda: build_rag_prompt(
+            pack_context((chunks, i) for i in chunk_ids), question
+        ))
+        stats = {}
+        timed("generate", llm.generate, MODEL_NAME, prompt, OPTIONS, stats)
+        ttfts.append(stats["ttft_s"])
+
+    return {
+        "pages": len(pages),
+        "chunks": len(chunks),
+        "index_bytes": len(faiss.serialize_index(index)),
+        "lexical_bytes": lexical.nbytes,
+        "ttft": ttfts,
+    }
+
+
+def summarize(samples):
+    return {
+        stage: {
+            "p50_ms": round(float(np.percentile(values, 50)) * 1000, 3),
+            "p95_ms": round(float(np.percentile(values, 95)) * 1000, 3),
+            "mean_ms": round(float(np.mean(values)) * 1000, 3),
+            "samples": len(values),
+        }
+        for stage, values in samples.items()
+        if values
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=300, help="fake Ollama delay before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=25, help="fake Ollama generation rate")
+    parser.add_argument("--num-tokens", type=int, default=64, help="tokens per fake answer")
+    parser.add_argument("--warm-caches", action="store_true",
+                        help="keep the embedding and query caches (default: measure the model every run)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="print p50 deltas against an earlier --json result")
+    args = parser.parse_args()
+
+    pdf_bytes = synthetic_pdf(args.pages, args.words_per_page)
+    embed_fn = encode_chunks if args.warm_caches else embedding_service.encode
+    if not args.warm_caches:
+        rag.query_cache.max_size = 0
+
+    samples = {stage: [] for stage in STAGES}
+    with FakeOllamaServer(latency_ms=args.latency_ms, tokens_per_s=args.tokens_per_s,
+                          num_tokens=args.num_tokens) as server:
+        # A private client, so neither the response cache nor the app's pool is involved
+        llm = OllamaClient(server.url)
+        for _ in range(args.runs):
+            info = run_once(pdf_bytes, QUESTIONS, llm, embed_fn, samples)
+
+    ttfts = [t for t in info["ttft"] if t is not None]
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": vars(args),
+        "pdf_bytes": len(pdf_bytes),
+        "pages": info["pages"],
+        "chunks": info["chunks"],
+        "index_bytes": info["index_bytes"],
+        "lexical_bytes": info["lexical_bytes"],
+        # ru_maxrss is in KiB on Linux; pool workers count as children
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "ttft_p50_ms": round(float(np.percentile(ttfts, 50)) * 1000, 3) if ttfts else None,
+        "stages": summarize(samples),
+    }
+
+    print(f"{result['pages']} pages, {result['chunks']} chunks, {args.runs} runs, "
+          f"commit {result['commit']}")
+    print(f"{'stage':<10}{'p50 ms':>12}{'p95 ms':>12}{'samples':>9}")
+    for stage, row in result["stages"].items():
+        print(f"{stage:<10}{row['p50_ms']:>12}{row['p95_ms']:>12}{row['samples']:>9}")
+    print(f"index {result['index_bytes'] / 1e6:.2f} MB + BM25 {result['lexical_bytes'] / 1e6:.2f} MB, "
+          f"peak RSS {result['peak_rss_mb']} MB (workers {result['children_peak_rss_mb']} MB)")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            before = json.load(f)
+        print(f"p50 vs {before.get('commit')}:")
+        for stage, row in result["stages"].items():
+            old = before.get("stages", {}).get(stage)
+            if old and old["p50_ms"]:
+                change = row["p50_ms"] / old["p50_ms"] - 1
+                print(f"  {stage:<10}{old['p50_ms']:>12} -> {row['p50_ms']:<12}({change:+.0%})")
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings.
+
+    Streamlit reruns and agent loops keep asking the same questions, so a
+    repeated query skips the model forward pass entirely. All misses in a
+    call are encoded together in one batch.
+    """
+
+    def __init__(self, encode_fn, max_size=QUERY_CACHE_SIZE):
+        self.encode_fn = encode_fn
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, queries):
+        """Return a (len(queries), dim) float32 array."""
+        queries = list(queries)
+
+        with self._lock:
+            missing = [q for q in dict.fromkeys(queries) if q not in self._vectors]
+
+        if missing:
+            new_vectors = np.asarray(self.encode_fn(missing), dtype=np.float32)
+            if new_vectors.ndim == 1:
+                new_vectors = new_vectors.reshape(1, -1)
+
+        with self._lock:
+            if missing:
+                for query, vector in zip(missing, new_vectors):
+                    self._vectors[query] = vector
+
+            vectors = []
+            for query in queries:
+                vector = self._vectors.get(query)
+                if vector is None:
+                    # Evicted by a concurrent call between the two locks
+                    vector = np.asarray(self.encode_fn([query]), dtype=np.float32).reshape(-1)
+                self._vectors[query] = vector
+                self._vectors.move_to_end(query)
+                vectors.append(vector)
+
+            self.misses += len(missing)
+            self.hits += len(queries) - len(missing)
+
+            while len(self._vectors) > self.max_size:
+                self._vectors.popitem(last=False)
+
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(vectors)
+
+    def stats(self) -> dict:
+        return {"size": len(self._vectors), "hits": self.hits, "misses": self.misses}
@@ -1,11 +1,82 @@
 import numpy as np
-from embeddings import model
+from embeddings import embedding_service
+from query_cache import QueryEmbeddingCache
+from lexical_index import is_keyword_query, reciprocal_rank_fusion
+from adaptive_k import RETRIEVE_K_MAX, RETRIEVE_K_MIN, adaptive_cutoff
 
-def retrieve_chunks(query, index, chunks, k=5):
-    query_embedding = model.encode([query], convert_to_numpy=True)
-    distances, indices = index.search(query_embedding, k)
+# Hybrid retrieval takes k * HYBRID_FETCH candidates from each retriever
+HYBRID_FETCH = 2
 
-    retrieved_chunks = [chunks[i] for i in indices[0]]
-    retrieved_distances = distances[0]
+# Repeated questions (e.g. on Streamlit reruns) skip the model entirely
+query_cache = QueryEmbeddingCache(embedding_service.encode)
 
-    return retrieved_chunks, retrieved_distances
+def retrieve_chunks(query, index, chunks, k=5, lexical=None):
+    return retrieve_chunks_batch([query], index, chunks, k=k, lexical=lexical)[0]
+
+def retrieve_chunks_batch(queries, index, chunks, k=5, lexical=None):
+    """
+    Encode and search many queries in one call.
+
+    Returns one (retrieved_chunks, retrieved_distances) pair per query.
+    """
+    return [
+        ([chunks[i] for i in ids], distances)
+        for ids, distances in retrieve_chunk_ids_batch(queries, index, k, lexical)
+    ]
+
+def retrieve_chunk_ids(query, index, k=5, lexical=None):
+    return retrieve_chunk_ids_batch([query], index, k=k, lexical=lexical)[0]
+
+def retrieve_chunk_ids_adaptive(query, index, lexical=None, k_min=RETRIEVE_K_MIN, k_max=RETRIEVE_K_MAX):
+    """
+    Between k_min and k_max chunk positions for `query`, cut off where the
+    matches turn poor (see adaptive_k.adaptive_cutoff).
+
+    Returns (chunk_ids, distances, stop_reason).
+    """
+    ids, distances = retrieve_chunk_ids(query, index, k=k_max, lexical=lexical)
+    n, reason = adaptive_cutoff(distances, k_min, k_max)
+    return ids[:n], distances[:n], reason
+
+def retrieve_chunk_ids_batch(queries, index, k=5, lexical=None):
+    """
+    Like retrieve_chunks_batch, but returns chunk positions instead of
+    text, best first, e.g. for context_packer.pack_context.
+
+    With `lexical` (a LexicalIndex over the same chunks) the dense and
+    BM25 rankings are fused with reciprocal rank fusion, and keyword
+    lookups that BM25 can answer skip the embedder entirely. Chunks
+    found only lexically have a NaN distance.
+    """
+    results = [None] * len(queries)
+
+    dense = []
+    for i, query in enumerate(queries):
+        if lexical is not None and is_keyword_query(query):
+            hits = lexical.search(query, k)
+            if hits:
+                results[i] = ([p for p, _ in hits], np.full(len(hits), np.nan, dtype=np.float32))
+                continue
+        dense.append(i)
+
+    if not dense:
+        return results
+
+    fetch = k if lexical is None else k * HYBRID_FETCH
+    query_embeddings = query_cache.encode([queries[i] for i in dense])
+    distances, indices = index.search(query_embeddings, fetch)
+
+    for i, row_distances, row_indices in zip(dense, distances, indices):
+        # FAISS pads with -1 when the index holds fewer than k chunks
+        found = row_indices >= 0
+        ids = [int(j) for j in row_indices[found]]
+        distance_of = dict(zip(ids, row_distances[found]))
+
+        if lexical is not None:
+            lexical_ids = [p for p, _ in lexical.search(queries[i], fetch)]
+            ids = reciprocal_rank_fusion([ids, lexical_ids])
+
+        ids = ids[:k]
+        results[i] = (ids, np.array([distance_of.get(j, np.nan) for j in ids], dtype=np.float32))
+
+    return results
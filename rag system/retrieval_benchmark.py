@@ -0,0 +1,87 @@
+"""
+Prompt context tokens with fixed top-k versus adaptive top-k retrieval.
+
+    python retrieval_benchmark.py report.pdf
+    python retrieval_benchmark.py report.pdf --questions questions.txt --k 5
+"""
+import argparse
+import json
+from collections import Counter
+
+from adaptive_k import RETRIEVE_K_MAX, RETRIEVE_K_MIN
+from context_packer import estimate_tokens, pack_context
+from ingest import ingest_pdf
+from rag import retrieve_chunk_ids, retrieve_chunk_ids_adaptive
+
+SAMPLE_QUESTIONS = [
+    "Summarize the document in less than 100 words",
+    "What are the main findings?",
+    "What risks are mentioned?",
+    "What recommendations are made?",
+    "Who is the intended audience?",
+    "What numbers or metrics are reported?",
+    "What time period does the document cover?",
+    "What are the limitations of the approach?",
+]
+
+
+def load_questions(path):
+    if not path:
+        return SAMPLE_QUESTIONS
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pdf")
+    parser.add_argument("--questions", help="file with one question per line")
+    parser.add_argument("--k", type=int, default=5, help="fixed k to compare against")
+    parser.add_argument("--k-min", type=int, default=RETRIEVE_K_MIN)
+    parser.add_argument("--k-max", type=int, default=RETRIEVE_K_MAX)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as f:
+        doc = ingest_pdf(f)
+    chunks, index, lexical = doc["chunks"], doc["index"], doc["lexical"]
+
+    report = []
+    for question in load_questions(args.questions):
+        fixed_ids, _ = retrieve_chunk_ids(question, index, k=args.k, lexical=lexical)
+        adaptive_ids, _, reason = retrieve_chunk_ids_adaptive(
+            question, index, lexical=lexical, k_min=args.k_min, k_max=args.k_max
+        )
+
+        # No budget here, so the token counts reflect the chunk selection only
+        fixed_tokens = estimate_tokens(pack_context(((chunks, i) for i in fixed_ids), token_budget=10 ** 9))
+        adaptive_tokens = estimate_tokens(pack_context(((chunks, i) for i in adaptive_ids), token_budget=10 ** 9))
+
+        report.append({
+            "question": question,
+            "fixed_k": len(fixed_ids),
+            "fixed_tokens": fixed_tokens,
+            "adaptive_k": len(adaptive_ids),
+            "adaptive_tokens": adaptive_tokens,
+            "stop_reason": reason,
+        })
+
+    print(f"{len(chunks)} chunks, fixed k={args.k}, adaptive k={args.k_min}..{args.k_max}")
+    print(f"{'question':<48}{'k':>4}{'tokens':>8}{'adapt k':>9}{'tokens':>8}  stop")
+    for row in report:
+        print(f"{row['question'][:46]:<48}{row['fixed_k']:>4}{row['fixed_tokens']:>8}"
+              f"{row['adaptive_k']:>9}{row['adaptive_tokens']:>8}  {row['stop_reason']}")
+
+    fixed_total = sum(row["fixed_tokens"] for row in report)
+    adaptive_total = sum(row["adaptive_tokens"] for row in report)
+    saved = 1 - adaptive_total / fixed_total if fixed_total else 0.0
+    print(f"total context tokens: fixed {fixed_total}, adaptive {adaptive_total} ({saved:.0%} saved)")
+    print("stop reasons: " + ", ".join(f"{r}={n}" for r, n in Counter(r["stop_reason"] for r in report).items()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
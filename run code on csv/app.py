@@ -1,10 +1,11 @@
 import streamlit as st
-import pandas as pd
 import os
 
 from prompt import build_prompt
-from llm import generate_code
-from executor import execute_code
+from llm import generate_checked_code
+from worker_pool import get_pool
+from catalog import catalog
+from tracing import span, tracer
 
 st.set_page_config(page_title="LLM Data Analyst", layout="wide")
 
@@ -12,14 +13,20 @@ st.title("📊 LLM-Powered Data Analyst")
 
 st.markdown("Ask questions about your **sales CSV data**.")
 
-# Load CSV preview
+# Prometheus scrape endpoint, when METRICS_PORT is set
+tracer.serve_metrics()
+
+# Preview from the dataset catalog; the CSV is only parsed when it changed
 if os.path.exists("data.csv"):
-    df = pd.read_csv("data.csv", encoding="latin1")
     st.subheader("Dataset Preview")
-    st.dataframe(df.head())
+    st.dataframe(catalog.preview("data.csv"))
+    st.caption(f"{catalog.get('data.csv')['rows']} rows")
 else:
     st.error("data.csv not found")
 
+# Sandboxed workers start warming up while the question is typed
+pool = get_pool("data.csv")
+
 user_query = st.text_input(
     "Enter your analysis request:",
     placeholder="e.g. Show total sales per region as a bar chart"
@@ -29,26 +36,39 @@ if st.button("Run Analysis"):
     if not user_query:
         st.warning("Please enter a query.")
     else:
-        with st.spinner("Generating code with LLM..."):
+        with st.spinner("Generating code with LLM..."), span("analysis.generate", "agent"):
             prompt = build_prompt(user_query)
-            code = generate_code(prompt)
+            code, analysis = generate_checked_code(prompt)
 
         st.subheader("🧠 Generated Code")
         st.code(code, language="python")
+        if analysis is not None:
+            note = f"Estimated cost: {analysis.cost}"
+            if analysis.rewrites:
+                note += f" ({len(analysis.rewrites)} row-wise apply vectorized before running)"
+            st.caption(note)
+            for finding in analysis.findings:
+                st.warning(f"Line {finding['line']}: {finding['message']}")
 
         with st.spinner("Executing code..."):
             try:
-                result = execute_code(code)
+                result = pool.run(code)
 
-                if os.path.exists("output.png"):
+                if result["figure"]:
                     st.subheader("📈 Visualization")
-                    st.image("output.png")
+                    st.image(result["figure"])
+
+                if result["stdout"]:
+                    st.text(result["stdout"])
 
                 if result["result_df"] is not None:
                     st.subheader("📋 Result Table")
                     st.dataframe(result["result_df"])
 
-                st.success("Analysis completed successfully.")
+                st.success(
+                    f"Analysis completed successfully "
+                    f"({result['wall_s']:.2f}s, {result['cpu_s']:.2f}s CPU)."
+                )
 
             except Exception as e:
                 st.error(f"Execution failed: {e}")
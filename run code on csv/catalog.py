@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+import columnar
+
+CSV_ENCODING = os.getenv("CSV_ENCODING", "latin1")
+CATALOG_SAMPLE_VALUES = int(os.getenv("CATALOG_SAMPLE_VALUES", "3"))
+CATALOG_PREVIEW_ROWS = int(os.getenv("CATALOG_PREVIEW_ROWS", "5"))
+
+# Bump when the profile layout changes, so old files are rebuilt
+PROFILE_VERSION = 3
+
+# Copy-on-write is always on from pandas 3.0 and opt-in on 2.x. With it,
+# a shallow copy of the shared frame is a free view whose writes never
+# reach the cache; older pandas falls back to a deep copy.
+_PANDAS_MAJOR = int(pd.__version__.split(".")[0])
+if _PANDAS_MAJOR == 2:
+    pd.set_option("mode.copy_on_write", True)
+COPY_ON_WRITE = _PANDAS_MAJOR >= 2
+
+
+def shared_view(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.copy(deep=not COPY_ON_WRITE)
+
+
+def profile_path(csv_path) -> str:
+    return f"{csv_path}.profile.json"
+
+
+def profile_csv(csv_path, encoding=CSV_ENCODING, sample_values=CATALOG_SAMPLE_VALUES,
+                preview_rows=CATALOG_PREVIEW_ROWS, df=None) -> dict:
+    """Describe every column of `csv_path`; `df` skips the parse if already loaded."""
+    if df is None:
+        df = pd.read_csv(csv_path, encoding=encoding)
+
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        non_null = series.dropna()
+        column = {
+            "name": str(name),
+            "dtype": str(series.dtype),
+            "nulls": int(series.isna().sum()),
+            "unique": int(non_null.nunique()),
+            "samples": [_plain(value) for value in non_null.drop_duplicates().head(sample_values)],
+        }
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series) and len(non_null):
+            column["min"] = _plain(non_null.min())
+            column["max"] = _plain(non_null.max())
+        columns.append(column)
+
+    stat = os.stat(csv_path)
+    return {
+        "version": PROFILE_VERSION,
+        "path": os.path.abspath(csv_path),
+        "encoding": encoding,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "rows": len(df),
+        "columns": columns,
+        # JSON-safe records, so the preview needs no second parse
+        "preview": json.loads(df.head(preview_rows).to_json(orient="records")),
+    }
+
+
+class DatasetCatalog:
+    """
+    Column profiles of CSV files, computed once per file version.
+
+    A profile is kept in memory and persisted as `<file>.profile.json`
+    next to the CSV, so restarts don't re-parse it either. The data
+    itself is converted once to a typed Arrow file next to the CSV and
+    memory-mapped (see columnar), or, without pyarrow, kept in memory as
+    one parsed DataFrame. All of them are invalidated when the file's
+    mtime or size changes.
+    """
+
+    def __init__(self, encoding=CSV_ENCODING):
+        self.encoding = encoding
+        self.profiles = {}  # absolute path -> profile
+        self.frames = {}  # absolute path -> (mtime_ns, size, DataFrame)
+        self.tables = {}  # absolute path -> (mtime_ns, size, memory-mapped Arrow table)
+        self.builds = 0
+        self.parses = 0
+        self._lock = threading.Lock()
+        self._frame_lock = threading.Lock()
+
+    def get(self, csv_path="data.csv") -> dict:
+        path = os.path.abspath(csv_path)
+        stat = os.stat(path)
+
+        with self._lock:
+            profile = self.profiles.get(path)
+            if not self._fresh(profile, stat):
+                profile = self._load(path)
+                if not self._fresh(profile, stat):
+                    profile = profile_csv(path, self.encoding, df=self.load(path))
+                    self.builds += 1
+                    self._save(path, profile)
+                self.profiles[path] = profile
+
+        return profile
+
+    def load(self, csv_path="data.csv", columns=None) -> pd.DataFrame:
+        """
+        A DataFrame of `columns` (all when None) the caller may modify.
+
+        From the memory-mapped Arrow copy only the requested columns are
+        materialized; otherwise it's a view of the shared parsed CSV.
+        """
+        if columnar.enabled():
+            return columnar.to_frame(self.table(csv_path), columns)
+
+        frame = shared_view(self.frame(csv_path))
+        if columns is not None:
+            frame = frame[[name for name in frame.columns if name in set(columns)]]
+        return frame
+
+    def table(self, csv_path="data.csv"):
+        """Memory-mapped Arrow table of the CSV, converted on first use."""
+        path = os.path.abspath(csv_path)
+        stat = os.stat(path)
+
+        with self._frame_lock:
+            cached = self.tables.get(path)
+            if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+                self.tables.pop(path, None)
+                table = columnar.open_table(path)
+                if table is None:
+                    columnar.convert_csv(path, self.encoding)
+                    self.parses += 1
+                    table = columnar.open_table(path)
+                cached = (stat.st_mtime_ns, stat.st_size, table)
+                self.tables[path] = cached
+
+        return cached[2]
+
+    def frame(self, csv_path="data.csv") -> pd.DataFrame:
+        """
+        The parsed CSV, shared across calls until the file changes.
+
+        Callers must not modify it; use load() for a private copy.
+        """
+        path = os.path.abspath(csv_path)
+        stat = os.stat(path)
+
+        with self._frame_lock:
+            cached = self.frames.get(path)
+            if cached is None or cached[:2] != (stat.st_mtime_ns, stat.st_size):
+                # Drop the stale frame first; these can be hundreds of MB
+                self.frames.pop(path, None)
+                cached = (stat.st_mtime_ns, stat.st_size, pd.read_csv(path, encoding=self.encoding))
+                self.parses += 1
+                self.frames[path] = cached
+
+        return cached[2]
+
+    def columns(self, csv_path="data.csv") -> list:
+        return [column["name"] for column in self.get(csv_path)["columns"]]
+
+    def preview(self, csv_path="data.csv") -> pd.DataFrame:
+        if columnar.enabled():
+            return columnar.to_frame(self.table(csv_path).slice(0, CATALOG_PREVIEW_ROWS))
+
+        profile = self.get(csv_path)
+        return pd.DataFrame(profile["preview"], columns=[column["name"] for column in profile["columns"]])
+
+    def _fresh(self, profile, stat) -> bool:
+        return (
+            profile is not None
+            and profile.get("version") == PROFILE_VERSION
+            and profile.get("encoding") == self.encoding
+            and profile.get("mtime_ns") == stat.st_mtime_ns
+            and profile.get("size") == stat.st_size
+        )
+
+    def _load(self, path):
+        try:
+            with open(profile_path(path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, path, profile):
+        tmp_path = f"{profile_path(path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(profile, f)
+            os.replace(tmp_path, profile_path(path))
+        except OSError:
+            # Read-only data directory: the in-memory profile still works
+            pass
+
+
+def _plain(value):
+    """numpy / pandas scalar -> JSON-serializable Python value."""
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+# Shared by the prompt builder and the preview
+catalog = DatasetCatalog()
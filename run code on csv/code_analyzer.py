@@ -0,0 +1,375 @@
+import ast
+import os
+
+import pandas as pd
+
+ALLOWED_MODULES = {
+    "pandas",
+    "matplotlib",
+    "matplotlib.pyplot"
+}
+
+# Names generated code may not call or reference at all, as variables
+# or as attributes (pd.io.common.os.system would otherwise get through)
+FORBIDDEN_NAMES = {
+    "eval", "exec", "compile", "__import__", "open", "input",
+    "globals", "locals", "vars", "getattr", "setattr", "delattr", "breakpoint",
+    "os", "sys", "subprocess", "socket", "shutil", "pathlib", "builtins", "importlib",
+    "io", "common", "compat", "core", "util", "api", "plotting", "testing",
+    "query", "read_pickle", "to_pickle",
+    # Foreign-function and loader modules, reachable from numpy and others
+    "np", "numpy", "ctypes", "ctypeslib", "cffi", "CDLL", "PyDLL", "cdll", "pydll",
+    "dlopen", "LoadLibrary", "load_library", "pickle", "marshal", "multiprocessing",
+    "threading", "signal", "system", "popen",
+}
+
+# The only attributes reachable directly on an imported module. Modules
+# re-export their own imports (pandas.io.common.os), so anything outside
+# this list is refused rather than filtered. None of them may be a module
+# itself (plt.cm, plt.style): nothing after it would be checked.
+MODULE_ATTRIBUTES = {
+    "pandas": {
+        "DataFrame", "Series", "Index", "MultiIndex", "Categorical", "Timestamp",
+        "Timedelta", "Period", "NaT", "NA", "Grouper", "NamedAgg", "IndexSlice",
+        "read_csv", "concat", "merge", "merge_asof", "pivot_table", "pivot", "crosstab",
+        "melt", "wide_to_long", "get_dummies", "cut", "qcut", "factorize", "unique",
+        "to_datetime", "to_numeric", "to_timedelta", "date_range", "period_range",
+        "timedelta_range", "isna", "isnull", "notna", "notnull", "set_option", "options",
+    },
+    "matplotlib": {"rcParams"},
+    "matplotlib.pyplot": {
+        "figure", "subplots", "subplot", "subplots_adjust", "tight_layout", "savefig",
+        "show", "close", "clf", "cla", "gca", "gcf", "plot", "bar", "barh", "pie",
+        "hist", "scatter", "boxplot", "stackplot", "fill_between", "step", "errorbar",
+        "axhline", "axvline", "text", "annotate", "title", "suptitle", "xlabel",
+        "ylabel", "xlim", "ylim", "xticks", "yticks", "legend", "grid", "colorbar",
+        "rcParams",
+    },
+}
+
+# Cheapest first; a script's cost class is the worst one it contains
+COST_CLASSES = ("vectorized", "row-wise", "quadratic")
+
+# Regeneration rounds asked of the LLM while slow patterns remain
+SLOW_CODE_REGENERATIONS = int(os.getenv("SLOW_CODE_REGENERATIONS", "1"))
+
+ROW_ITERATORS = {"iterrows", "itertuples", "iteritems"}
+GROWING_CALLS = {"concat", "append", "merge", "join"}
+# Methods whose result has as many rows as the frame they're called on
+# (up to filtering), so a variable assigned from one is still dataset-sized
+ROW_PRESERVING = {"copy", "dropna", "fillna", "sort_values", "assign", "astype", "rename", "drop"}
+
+
+class Analysis:
+    """
+    Result of analyze(): the (possibly rewritten) code and what was found.
+
+    Each finding is a dict with "rule", "line", "message" and "cost"
+    (one of COST_CLASSES). `rewrites` lists the findings that were
+    vectorized in `code`; `findings` are the ones left.
+    """
+
+    def __init__(self, code, findings, rewrites):
+        self.code = code
+        self.findings = findings
+        self.rewrites = rewrites
+
+    @property
+    def cost(self) -> str:
+        worst = max((COST_CLASSES.index(f["cost"]) for f in self.findings), default=0)
+        return COST_CLASSES[worst]
+
+    @property
+    def slow(self) -> bool:
+        return self.cost != "vectorized"
+
+    def feedback(self) -> str:
+        """Instructions for regenerating the code without the slow patterns."""
+        lines = [
+            "The previous code was rejected because it processes rows one at a time:",
+            *(f"- line {f['line']}: {f['message']}" for f in self.findings),
+            "Rewrite it with vectorized pandas operations (column arithmetic, "
+            "boolean masks, groupby/agg, merge, pivot_table) and no Python loops over rows.",
+        ]
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {"cost": self.cost, "findings": self.findings, "rewrites": self.rewrites}
+
+
+def validate_code(code: str) -> ast.Module:
+    """
+    Parse `code` and enforce the sandbox rules on its syntax tree.
+
+    Raises ValueError for imports outside ALLOWED_MODULES, forbidden
+    names (eval, open, os, ...) used as variables or attributes, private
+    and dunder attributes such as __class__ (the usual way out of an exec
+    sandbox), and module attributes outside MODULE_ATTRIBUTES.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as exc:
+        raise ValueError(f"Generated code is not valid Python: {exc}") from exc
+
+    modules = {}  # local name -> module it is bound to
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name not in ALLOWED_MODULES:
+                    raise ValueError(f"Forbidden operation detected: import {alias.name}")
+                if alias.asname:
+                    modules[alias.asname] = alias.name
+                else:
+                    modules[alias.name.split(".")[0]] = alias.name.split(".")[0]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or node.module not in ALLOWED_MODULES:
+                raise ValueError(f"Forbidden operation detected: from {node.module} import")
+            for alias in node.names:
+                submodule = f"{node.module}.{alias.name}"
+                if submodule in ALLOWED_MODULES:
+                    modules[alias.asname or alias.name] = submodule
+                elif alias.name not in MODULE_ATTRIBUTES[node.module]:
+                    raise ValueError(f"Forbidden operation detected: from {node.module} import {alias.name}")
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in FORBIDDEN_NAMES:
+            raise ValueError(f"Forbidden operation detected: {node.id} (line {node.lineno})")
+        if not isinstance(node, ast.Attribute):
+            continue
+        if node.attr.startswith("_") or node.attr in FORBIDDEN_NAMES:
+            raise ValueError(f"Forbidden operation detected: .{node.attr} (line {node.lineno})")
+
+        module = _module_of(node.value, modules)
+        if (module is not None and f"{module}.{node.attr}" not in ALLOWED_MODULES
+                and node.attr not in MODULE_ATTRIBUTES[module]):
+            raise ValueError(f"Forbidden operation detected: {module}.{node.attr} (line {node.lineno})")
+
+    return tree
+
+
+def _module_of(node, modules):
+    """The module `node` evaluates to (pd -> "pandas"), or None."""
+    if isinstance(node, ast.Name):
+        return modules.get(node.id)
+    if isinstance(node, ast.Attribute):
+        parent = _module_of(node.value, modules)
+        if parent is not None and f"{parent}.{node.attr}" in ALLOWED_MODULES:
+            return f"{parent}.{node.attr}"
+    return None
+
+
+def analyze(code: str) -> Analysis:
+    """Validate `code`, vectorize what can be, and find the remaining slow patterns."""
+    tree = validate_code(code)
+
+    rewriter = _ApplyRewriter()
+    tree = ast.fix_missing_locations(rewriter.visit(tree))
+    if rewriter.rewrites:
+        code = ast.unparse(tree)
+
+    finder = _SlowPatternFinder(_dataset_frames(tree))
+    finder.visit(tree)
+    return Analysis(code, finder.findings, rewriter.rewrites)
+
+
+class _SlowPatternFinder(ast.NodeVisitor):
+    """Row loops, row-wise apply, and frames grown inside loops."""
+
+    def __init__(self, frames):
+        self.frames = frames  # names holding the dataset, see _dataset_frames
+        self.findings = []
+        self._loops = 0  # enclosing loops that run once per row
+
+    def visit_For(self, node):
+        rows = _row_loop(node.iter, self.frames)
+        if rows:
+            self._add(node, "row-loop", rows, "quadratic" if self._loops else "row-wise")
+            self._loops += 1
+
+        self.generic_visit(node)
+        if rows:
+            self._loops -= 1
+
+    def visit_comprehension(self, node):
+        rows = _row_loop(node.iter, self.frames)
+        if rows:
+            self._add(node.iter, "row-loop", rows, "quadratic" if self._loops else "row-wise")
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        name = _method_name(node)
+        if name == "apply" and _row_axis(node):
+            self._add(node, "row-apply", ".apply(axis=1) calls a Python function once per row",
+                      "quadratic" if self._loops else "row-wise")
+        elif name in GROWING_CALLS and self._loops:
+            self._add(node, "growing-frame", f"{name}() inside a row loop copies the frame on every iteration",
+                      "quadratic")
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        if self._loops and any(_cell_access(target) for target in node.targets):
+            self._add(node, "cell-write", "assigning single cells (.loc/.at/.iloc) inside a row loop", "row-wise")
+        self.generic_visit(node)
+
+    def _add(self, node, rule, message, cost):
+        self.findings.append({"rule": rule, "line": node.lineno, "message": message, "cost": cost})
+
+
+class _ApplyRewriter(ast.NodeTransformer):
+    """
+    X.apply(lambda row: <expr>, axis=1) -> <expr> over X's columns, when
+    <expr> is only arithmetic or a single comparison on row["col"] / row.col
+    and constants, e.g. row["SALES"] / row["QUANTITYORDERED"].
+    """
+
+    def __init__(self):
+        self.rewrites = []
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if not (_method_name(node) == "apply" and _row_axis(node) and len(node.args) == 1):
+            return node
+
+        function = node.args[0]
+        if not (isinstance(function, ast.Lambda) and len(function.args.args) == 1
+                and not function.args.vararg and not function.args.kwarg):
+            return node
+
+        row = function.args.args[0].arg
+        if not _vectorizable(function.body, row):
+            return node
+
+        frame = node.func.value
+        if any(isinstance(child, ast.Call) for child in ast.walk(frame)):
+            # The frame expression is repeated per column; only cheap ones
+            return node
+
+        self.rewrites.append({
+            "rule": "row-apply",
+            "line": node.lineno,
+            "message": "vectorized .apply(axis=1) into column arithmetic",
+            "cost": "vectorized",
+        })
+        return ast.copy_location(_RowToFrame(row, frame).visit(function.body), node)
+
+
+class _RowToFrame(ast.NodeTransformer):
+    def __init__(self, row, frame):
+        self.row = row
+        self.frame = frame
+
+    def visit_Name(self, node):
+        if node.id == self.row:
+            return ast.copy_location(ast.parse(ast.unparse(self.frame), mode="eval").body, node)
+        return node
+
+
+def _vectorizable(node, row) -> bool:
+    """Elementwise on Series exactly as on scalars, and uses the row."""
+    if isinstance(node, ast.BinOp) and not isinstance(node.op, ast.MatMult):
+        return (_vectorizable(node.left, row) or _constant(node.left)) and \
+               (_vectorizable(node.right, row) or _constant(node.right)) and \
+               (_uses(node.left, row) or _uses(node.right, row))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _vectorizable(node.operand, row)
+    if isinstance(node, ast.Compare) and len(node.ops) == 1 and not isinstance(node.ops[0], (ast.In, ast.NotIn, ast.Is, ast.IsNot)):
+        sides = (node.left, node.comparators[0])
+        return all(_vectorizable(side, row) or _constant(side) for side in sides) and \
+            any(_uses(side, row) for side in sides)
+    return _column(node, row)
+
+
+def _column(node, row) -> bool:
+    if isinstance(node, ast.Subscript):
+        return (isinstance(node.value, ast.Name) and node.value.id == row
+                and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str))
+    if isinstance(node, ast.Attribute):
+        # row.name, row.index, ... are Series attributes, not columns
+        return isinstance(node.value, ast.Name) and node.value.id == row and not hasattr(pd.Series, node.attr)
+    return False
+
+
+def _constant(node) -> bool:
+    return isinstance(node, ast.Constant) and isinstance(node.value, (int, float))
+
+
+def _uses(node, row) -> bool:
+    return any(isinstance(child, ast.Name) and child.id == row for child in ast.walk(node))
+
+
+def _method_name(call):
+    return call.func.attr if isinstance(call.func, ast.Attribute) else None
+
+
+def _row_axis(call) -> bool:
+    return any(
+        keyword.arg == "axis" and isinstance(keyword.value, ast.Constant)
+        and keyword.value.value in (1, "columns")
+        for keyword in call.keywords
+    )
+
+
+def _row_loop(iterable, frames):
+    """Why `for ... in iterable` runs once per row of the dataset, or None."""
+    if isinstance(iterable, ast.Call):
+        name = _method_name(iterable)
+        if name in ROW_ITERATORS:
+            return f".{name}() iterates over rows in Python"
+        # range(len(df)) / range(df.shape[0]); a small result_df is fine
+        if isinstance(iterable.func, ast.Name) and iterable.func.id == "range" and iterable.args:
+            bound = iterable.args[-1] if len(iterable.args) > 1 else iterable.args[0]
+            if (isinstance(bound, ast.Call) and isinstance(bound.func, ast.Name) and bound.func.id == "len"
+                    and bound.args and _dataset(bound.args[0], frames)):
+                return "range(len(...)) indexes rows one at a time"
+            if (isinstance(bound, ast.Subscript) and isinstance(bound.value, ast.Attribute)
+                    and bound.value.attr == "shape" and _dataset(bound.value.value, frames)):
+                return "range(df.shape[0]) indexes rows one at a time"
+    if (isinstance(iterable, ast.Attribute) and iterable.attr in {"index", "values"}
+            and _dataset(iterable.value, frames)):
+        return f"looping over .{iterable.attr} visits rows one at a time"
+    return None
+
+
+def _dataset_frames(tree):
+    """
+    Names bound to dataset-sized frames: `df`, variables assigned from
+    read_csv(), and filters, column selections or ROW_PRESERVING method
+    calls on those.
+    """
+    frames = {"df"}
+    assigns = [node for node in ast.walk(tree) if isinstance(node, ast.Assign)]
+    changed = True
+    while changed:
+        changed = False
+        for node in assigns:
+            value = node.value
+            if not ((isinstance(value, ast.Call) and _method_name(value) == "read_csv")
+                    or _dataset(value, frames)):
+                continue
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id not in frames:
+                    frames.add(target.id)
+                    changed = True
+    return frames
+
+
+def _dataset(node, frames) -> bool:
+    """Whether `node` has one row (or item) per dataset row: df, df[mask], df["A"], df.A, ..."""
+    if isinstance(node, ast.Name):
+        return node.id in frames
+    if isinstance(node, ast.Subscript):
+        # df.loc[...] / df.iloc[...] select like df[...]
+        value = node.value
+        if isinstance(value, ast.Attribute) and value.attr in {"loc", "iloc"}:
+            value = value.value
+        return _dataset(value, frames)
+    if isinstance(node, ast.Attribute):
+        return node.attr not in {"index", "values", "columns", "shape"} and _dataset(node.value, frames)
+    if isinstance(node, ast.Call):
+        return _method_name(node) in ROW_PRESERVING and _dataset(node.func.value, frames)
+    return False
+
+
+def _cell_access(target) -> bool:
+    return (isinstance(target, ast.Subscript) and isinstance(target.value, ast.Attribute)
+            and target.value.attr in {"loc", "at", "iloc", "iat"})
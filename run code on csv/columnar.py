@@ -0,0 +1,194 @@
+"""
+Typed, memory-mappable copies of CSV datasets.
+
+    python columnar.py data.csv
+"""
+import argparse
+import ast
+import os
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # optional: without it the CSV is parsed as before
+    pa = None
+
+# "arrow" keeps an Arrow IPC copy of each CSV; "off" always parses the CSV
+COLUMNAR = os.getenv("COLUMNAR", "arrow")
+
+# String columns with at most this many distinct values, and no more than
+# CATEGORY_MAX_RATIO of the row count, are stored dictionary-encoded.
+# to_frame() decodes them again, so generated code sees plain strings.
+CATEGORY_MAX_UNIQUE = int(os.getenv("CATEGORY_MAX_UNIQUE", "1000"))
+CATEGORY_MAX_RATIO = float(os.getenv("CATEGORY_MAX_RATIO", "0.05"))
+
+def enabled() -> bool:
+    return COLUMNAR == "arrow" and pa is not None
+
+
+def columnar_path(csv_path) -> str:
+    return f"{csv_path}.arrow"
+
+
+def convert_csv(csv_path, encoding, df=None) -> str:
+    """
+    Write `csv_path` as an uncompressed Arrow IPC file next to it.
+
+    Uncompressed, so it can be memory-mapped and read without copying.
+    The source's mtime and size are stored in the schema metadata.
+    """
+    if df is None:
+        df = pd.read_csv(csv_path, encoding=encoding)
+
+    df = df.copy(deep=False)
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_string_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+            unique = series.nunique()
+            if unique <= CATEGORY_MAX_UNIQUE and unique <= CATEGORY_MAX_RATIO * len(series):
+                df[name] = series.astype("category")
+
+    stat = os.stat(csv_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"source_mtime_ns": str(stat.st_mtime_ns).encode(),
+        b"source_size": str(stat.st_size).encode(),
+    })
+
+    path = columnar_path(csv_path)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    return path
+
+
+def open_table(csv_path):
+    """Memory-mapped table for `csv_path`, or None if missing or stale."""
+    path = columnar_path(csv_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    stat = os.stat(csv_path)
+    metadata = table.schema.metadata or {}
+    if (metadata.get(b"source_mtime_ns") != str(stat.st_mtime_ns).encode()
+            or metadata.get(b"source_size") != str(stat.st_size).encode()):
+        return None
+    return table
+
+
+def to_frame(table, columns=None) -> pd.DataFrame:
+    """
+    Materialize only `columns` (all when None), in file order.
+
+    Dictionary-encoded columns come back with their original string
+    dtype rather than as pandas categoricals, which reject string
+    concatenation and assigning new values.
+    """
+    if columns is not None:
+        wanted = set(columns)
+        table = table.select([name for name in table.column_names if name in wanted])
+
+    if any(pa.types.is_dictionary(field.type) for field in table.schema):
+        schema = pa.schema(
+            [field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+             for field in table.schema],
+            metadata=table.schema.metadata
+        )
+        table = table.cast(schema)
+    return table.to_pandas()
+
+
+def referenced_columns(code, columns):
+    """
+    Columns `code` can touch, or None when it may need the whole frame.
+
+    Every use of the dataset, i.e. `df` or a variable assigned from
+    read_csv(), must select columns by name: df["A"], df[["A", "B"]],
+    df.A or df.groupby(...)["A"]. Any other use (df.describe(), print(df),
+    df[mask], ...) may depend on every column, and so does code naming no
+    column at all. Every column name appearing in the code is kept, so
+    filters and group keys are loaded too.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    frames = {"df"}
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+        if (isinstance(node, ast.Assign) and isinstance(node.value, ast.Call)
+                and _call_name(node.value) == "read_csv"):
+            frames.update(target.id for target in node.targets if isinstance(target, ast.Name))
+
+    columns = set(columns)
+    found = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value in columns:
+            found.add(node.value)
+        elif isinstance(node, ast.Attribute) and node.attr in columns:
+            found.add(node.attr)
+        elif (isinstance(node, ast.Name) and node.id in frames and isinstance(node.ctx, ast.Load)
+                and not _selects_columns(node, parents, columns)):
+            return None
+
+    return found or None
+
+
+def _selects_columns(node, parents, columns):
+    parent = parents.get(node)
+    if isinstance(parent, ast.Attribute):
+        if parent.attr in columns:
+            return True
+        # df.groupby(...)["A"]
+        call = parents.get(parent)
+        if parent.attr == "groupby" and isinstance(call, ast.Call):
+            parent, node = parents.get(call), call
+
+    return isinstance(parent, ast.Subscript) and parent.value is node and _literal_names(parent.slice)
+
+
+def _literal_names(node):
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return all(_literal_names(element) for element in node.elts)
+    return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+
+def _call_name(call):
+    func = call.func
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    if isinstance(func, ast.Name):
+        return func.id
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("csv_path")
+    parser.add_argument("--encoding", default="latin1")
+    args = parser.parse_args()
+
+    if pa is None:
+        parser.error("pyarrow is not installed")
+
+    path = convert_csv(args.csv_path, args.encoding)
+    table = open_table(args.csv_path)
+    print(f"{path}: {table.num_rows} rows, {os.path.getsize(path) / 1e6:.2f} MB")
+    for field in table.schema:
+        print(f"  {field.name}: {field.type}")
+
+
+if __name__ == "__main__":
+    main()
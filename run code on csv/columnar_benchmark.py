@@ -0,0 +1,109 @@
+"""
+Load time and memory of read_csv against the memory-mapped Arrow copy.
+
+    python columnar_benchmark.py --rows 1000000 --runs 3
+    python columnar_benchmark.py --csv exports/orders.csv --columns TERRITORY,SALES
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import columnar
+from catalog import CSV_ENCODING
+
+
+def scaled_csv(source, rows, out_dir, encoding=CSV_ENCODING) -> str:
+    """`source` repeated up to `rows` rows, as a new CSV in `out_dir`."""
+    df = pd.read_csv(source, encoding=encoding)
+    repeats = -(-rows // len(df))
+    path = os.path.join(out_dir, f"{rows}.csv")
+    pd.concat([df] * repeats, ignore_index=True).head(rows).to_csv(path, index=False, encoding=encoding)
+    return path
+
+
+def peak_rss_kib():
+    # ru_maxrss survives exec (so a spawned worker starts at its parent's
+    # peak); the VmHWM of the process's own address space doesn't
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(method, csv_path, columns, encoding):
+    """Runs in a fresh process, so RSS isn't shared between methods."""
+    baseline = peak_rss_kib()
+    start = time.perf_counter()
+
+    if method == "read_csv":
+        df = pd.read_csv(csv_path, encoding=encoding)
+    elif method == "read_csv_usecols":
+        df = pd.read_csv(csv_path, encoding=encoding, usecols=columns)
+    else:
+        table = columnar.open_table(csv_path)
+        df = columnar.to_frame(table, columns if method == "arrow_columns" else None)
+
+    seconds = time.perf_counter() - start
+    return seconds, (peak_rss_kib() - baseline) / 1024, int(df.memory_usage(deep=True).sum())
+
+
+def measure(method, csv_path, columns, encoding, runs):
+    results = []
+    for _ in range(runs):
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results.append(pool.submit(_measure, method, csv_path, columns, encoding).result())
+
+    return {
+        "seconds": statistics.median(r[0] for r in results),
+        "rss_mb": statistics.median(r[1] for r in results),
+        "frame_mb": results[0][2] / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", help="benchmark this file instead of a scaled-up data.csv")
+    parser.add_argument("--source", default="data.csv")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--columns", default="TERRITORY,SALES", help="comma-separated projection")
+    parser.add_argument("--encoding", default=CSV_ENCODING)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if columnar.pa is None:
+        parser.error("pyarrow is not installed")
+
+    columns = args.columns.split(",")
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.csv or scaled_csv(args.source, args.rows, tmp, args.encoding)
+
+        start = time.perf_counter()
+        arrow_path = columnar.convert_csv(csv_path, args.encoding)
+        convert_s = time.perf_counter() - start
+
+        print(f"{csv_path}: {os.path.getsize(csv_path) / 1e6:.1f} MB CSV, "
+              f"{os.path.getsize(arrow_path) / 1e6:.1f} MB Arrow (converted once in {convert_s:.2f}s)")
+        print(f"{'method':<18}{'load s':>10}{'peak RSS MB':>14}{'frame MB':>11}")
+        try:
+            for method in ("read_csv", "read_csv_usecols", "arrow_all", "arrow_columns"):
+                row = measure(method, csv_path, columns, args.encoding, args.runs)
+                print(f"{method:<18}{row['seconds']:>10.3f}{row['rss_mb']:>14.1f}{row['frame_mb']:>11.1f}")
+        finally:
+            if args.csv:
+                os.remove(arrow_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,169 @@
-ALLOWED_MODULES = {
-    "pandas",
-    "matplotlib",
-    "matplotlib.pyplot"
-}
-
-FORBIDDEN_KEYWORDS = [
-    "import os",
-    "import sys",
-    "subprocess",
-    "socket",
-    "eval(",
-    "exec(",
-]
+import codecs
+import contextlib
+import io
+import logging
+import os
+import sys
+
+import pandas as pd
+
+from catalog import CSV_ENCODING, catalog
+from code_analyzer import ALLOWED_MODULES, MODULE_ATTRIBUTES, analyze
+from columnar import referenced_columns
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Where generated code is told to save its chart (see prompt.py)
+FIGURE_FILE = "output.png"
 
 def safe_import(name, globals=None, locals=None, fromlist=(), level=0):
     if name in ALLOWED_MODULES:
         return __import__(name, globals, locals, fromlist, level)
     raise ImportError(f"Import not allowed: {name}")
 
+def _same_encoding(a, b) -> bool:
+    try:
+        return codecs.lookup(a).name == codecs.lookup(b).name
+    except LookupError:
+        return False
+
+class SandboxPandas:
+    """
+    pandas as generated code sees it.
+
+    read_csv() of the dataset returns the catalog's cached data, limited
+    to `columns` when given, instead of parsing the file again; any other
+    call, or read_csv with options that would change the result, goes to
+    pandas.
+    """
+
+    def __init__(self, csv_path, columns=None):
+        self._csv_path = os.path.abspath(csv_path)
+        self._columns = columns
+
+    def __getattr__(self, name):
+        # Second line of defense behind code_analyzer.validate_code
+        if name not in MODULE_ATTRIBUTES["pandas"]:
+            raise AttributeError(f"pandas.{name} is not available in the sandbox")
+        return getattr(pd, name)
+
+    def read_csv(self, filepath_or_buffer, *args, **kwargs):
+        if (
+            not args
+            and set(kwargs) <= {"encoding"}
+            and _same_encoding(kwargs.get("encoding", CSV_ENCODING), CSV_ENCODING)
+            and isinstance(filepath_or_buffer, (str, os.PathLike))
+            and self._is_dataset(os.fspath(filepath_or_buffer))
+        ):
+            return catalog.load(self._csv_path, self._columns)
+        return pd.read_csv(filepath_or_buffer, *args, **kwargs)
+
+    def _is_dataset(self, path):
+        # The bare file name counts too: worker_pool runs code in a private
+        # directory, while the prompt tells it to read "data.csv"
+        return os.path.abspath(path) == self._csv_path or path == os.path.basename(self._csv_path)
+
+def sandbox_import(pandas_module):
+    """safe_import, with `import pandas` resolving to `pandas_module`."""
+    def _import(name, globals=None, locals=None, fromlist=(), level=0):
+        if name == "pandas":
+            return pandas_module
+        return safe_import(name, globals, locals, fromlist, level)
+    return _import
+
 def extract_python_code(llm_output: str) -> str:
+    """
+    The code in an LLM answer: the first fenced block tagged python (or
+    py), else the first fenced block, else the whole answer when it has
+    no fences. The dataset is preloaded as `df`, so code need not import
+    pandas.
+    """
     if "```" not in llm_output:
         return llm_output.strip()
 
-    parts = llm_output.split("```")
-    for part in parts:
-        if "import pandas" in part:
-            return part.replace("python", "").strip()
+    blocks = []
+    # Fenced blocks are the odd-numbered parts between ``` markers
+    for part in llm_output.split("```")[1::2]:
+        tag, _, body = part.partition("\n")
+        if tag.strip() and not tag.strip().isidentifier():
+            # No language tag: the code starts on the fence line
+            tag, body = "", part
+        if body.strip():
+            blocks.append((tag.strip().lower(), body.strip()))
+
+    for tag, body in blocks:
+        if tag in ("python", "py", "python3"):
+            return body
+    if blocks:
+        return blocks[0][1]
 
     raise ValueError("No executable Python code found.")
 
 def validate_code(code: str):
-    for keyword in FORBIDDEN_KEYWORDS:
-        if keyword in code:
-            raise ValueError(f"Forbidden operation detected: {keyword}")
+    """Enforce the sandbox rules; returns the code_analyzer.Analysis."""
+    return analyze(code)
+
+def execute_code(code: str, csv_path="data.csv"):
+    # Simple row-wise applies come back vectorized in analysis.code
+    analysis = validate_code(extract_python_code(code))
+    clean_code = analysis.code
+
+    # Only the columns the code names are loaded from the columnar copy
+    columns = None
+    if os.path.exists(csv_path):
+        columns = referenced_columns(clean_code, catalog.columns(csv_path))
+
+    if columns is None:
+        return _run(clean_code, csv_path, columns, analysis.cost)
+
+    # The projected attempt's prints and figure are held back, so a rerun
+    # doesn't leave the discarded attempt's output behind
+    stdout = io.StringIO()
+    figure_mtime = _mtime(FIGURE_FILE)
+    try:
+        with contextlib.redirect_stdout(stdout):
+            result = _run(clean_code, csv_path, columns, analysis.cost)
+    except KeyError as exc:
+        if not _missing_dataset_column(exc, catalog.columns(csv_path), columns):
+            sys.stdout.write(stdout.getvalue())
+            raise
+        # A column reached in a way referenced_columns couldn't see
+        logger.debug("Column projection missed a column; rerunning with all columns")
+        _discard_figures(figure_mtime)
+        return _run(clean_code, csv_path, None, analysis.cost)
 
-def execute_code(code: str):
-    clean_code = extract_python_code(code)
-    validate_code(clean_code)
+    sys.stdout.write(stdout.getvalue())
+    return result
+
+def _missing_dataset_column(exc, dataset_columns, loaded) -> bool:
+    """Whether KeyError `exc` names a dataset column the projection left out."""
+    missing = set(dataset_columns) - set(loaded)
+    key = exc.args[0] if exc.args else None
+    if key in missing:
+        return True
+    # df[["A", "B"]] reports e.g. "['B'] not in index"
+    return isinstance(key, str) and any(repr(name) in key for name in missing)
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _discard_figures(figure_mtime):
+    """Drop figures drawn or saved since `figure_mtime` was taken."""
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is not None:
+        plt.close("all")
+    if _mtime(FIGURE_FILE) != figure_mtime:
+        try:
+            os.remove(FIGURE_FILE)
+        except OSError:
+            pass
+
+def _run(clean_code, csv_path, columns, cost):
+    sandbox_pandas = SandboxPandas(csv_path, columns)
 
     safe_globals = {
         "__builtins__": {
@@ -49,17 +176,23 @@ def execute_code(code: str):
             "list": list,
             "dict": dict,
             "set": set,
-            "__import__": safe_import
+            "__import__": sandbox_import(sandbox_pandas)
         }
     }
 
+    # Parsed once per file version (see catalog.load); each run gets its
+    # own frame, so edits made by one analysis don't leak into the next
+    if os.path.exists(csv_path):
+        safe_globals["df"] = sandbox_pandas.read_csv(csv_path)
+
     safe_locals = {}
 
-    print("===== EXECUTING CLEAN CODE =====")
-    print(clean_code)
-    print("================================")
+    logger.debug("Executing generated code:\n%s", clean_code)
 
-    exec(clean_code, safe_globals, safe_locals)
+    with span("execute_code", "tool", lines=clean_code.count("\n") + 1, cost=cost,
+              columns=len(columns) if columns is not None else "all") as s:
+        exec(clean_code, safe_globals, safe_locals)
+        s.set(result=safe_locals.get("result_df") is not None)
 
     return {
         "result_df": safe_locals.get("result_df", None)
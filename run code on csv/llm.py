@@ -1,18 +1,85 @@
+import asyncio
 import os
-from groq import Groq
+import sys
+
 from dotenv import load_dotenv
 
+from code_analyzer import SLOW_CODE_REGENERATIONS, analyze
+from executor import extract_python_code
+from tracing import span
+
+# Shared with the other apps, from the repo root (see shared/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.llm_client import get_groq_client
+from shared.response_cache import ResponseCache
+
 load_dotenv(dotenv_path="../.env")
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-def generate_code(prompt: str) -> str:
-    response = client.chat.completions.create(
-        model="groq/compound-mini",
-        messages=[
-            {"role": "system", "content": "You generate safe Python data analysis code."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.2
-    )
-    return response.choices[0].message.content
+# Shared client; the Groq SDK client itself is created on first call
+client = get_groq_client()
+
+MODEL_NAME = "groq/compound-mini"
+TEMPERATURE = 0.2
+
+# Re-asked questions about the same data reuse the generated code
+response_cache = ResponseCache()
+
+def _messages(prompt: str, history=()):
+    messages = [
+        {"role": "system", "content": "You generate safe Python data analysis code."},
+        {"role": "user", "content": prompt}
+    ]
+    # Earlier answers and the feedback on them, so the model sees the code it is fixing
+    for code, feedback in history:
+        messages.append({"role": "assistant", "content": code})
+        messages.append({"role": "user", "content": feedback})
+    return messages
+
+def generate_code(prompt: str, history=()) -> str:
+    """
+    Code for `prompt`; `history` is a sequence of (previous answer,
+    feedback) turns that continue the conversation.
+    """
+    history = list(history)
+    with span("generate_code", "llm", model=MODEL_NAME, turns=len(history)) as s:
+        s.set(cached=True)
+
+        def call():
+            stats = {}
+            code = client.chat(MODEL_NAME, _messages(prompt, history), temperature=TEMPERATURE, stats=stats)
+            s.set(
+                cached=False,
+                prompt_tokens=stats["prompt_tokens"],
+                completion_tokens=stats["completion_tokens"]
+            )
+            return code
+
+        # The whole conversation is the cache key, not just the first prompt
+        key = "\0".join([prompt, *(f"{code}\0{feedback}" for code, feedback in history)])
+        return response_cache.cached(MODEL_NAME, TEMPERATURE, key, call)
+
+async def agenerate_code(prompt: str) -> str:
+    return await asyncio.to_thread(generate_code, prompt)
+
+def generate_checked_code(prompt: str, rounds=SLOW_CODE_REGENERATIONS):
+    """
+    generate_code, asked again with the analyzer's feedback while the code
+    still loops over rows. The rejected code goes back as the assistant's
+    turn, since the feedback refers to its line numbers. Returns (code,
+    analysis); analysis is None when the code breaks the sandbox rules,
+    which execute_code reports.
+    """
+    code = generate_code(prompt)
+    history = []
+    for attempt in range(rounds + 1):
+        try:
+            extracted = extract_python_code(code)
+            analysis = analyze(extracted)
+        except ValueError:
+            return code, None
+        if not analysis.slow or attempt == rounds:
+            return code, analysis
+        with span("regenerate_code", "llm", cost=analysis.cost, findings=len(analysis.findings)):
+            # Just the code, so "line N" in the feedback matches what the model sees
+            history.append((f"```python\n{extracted}\n```", analysis.feedback()))
+            code = generate_code(prompt, history)
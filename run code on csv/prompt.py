@@ -1,14 +1,14 @@
-from schema import get_schema
+from schema import describe_schema
 
 def build_prompt(user_query: str) -> str:
-    columns = get_schema()
+    schema = describe_schema()
 
     return f"""
 You are a Python data analysis code generator.
 
 DATASET SCHEMA:
 The CSV file "data.csv" has the following columns:
-{", ".join(columns)}
+{schema}
 
 SEMANTIC MAPPING RULES:
 - If the user says "region", prefer using:
@@ -20,11 +20,15 @@ SEMANTIC MAPPING RULES:
 STRICT RULES:
 1. Generate ONLY valid Python code.
 2. Use ONLY pandas and matplotlib.
-3. Read data ONLY from "data.csv" using pandas with encoding="latin1".
+3. The data is already loaded as a pandas DataFrame named df; use it
+   instead of reading "data.csv" (if you do read it, use pandas with
+   encoding="latin1").
 4. Do NOT import os, sys, subprocess, pathlib, socket, or networking libraries.
 5. Do NOT use eval(), exec(), or __import__().
 6. Do NOT write files except "output.png".
 7. Code must run top-to-bottom with no user input.
+8. Use vectorized pandas (column arithmetic, masks, groupby/agg); never
+   loop over rows with for, iterrows(), itertuples() or apply(axis=1).
 
 OUTPUT CONTRACT:
 - Print a short textual summary.
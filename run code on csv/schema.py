@@ -1,5 +1,19 @@
-import pandas as pd
+from catalog import catalog
 
 def get_schema(csv_path="data.csv"):
-    df = pd.read_csv(csv_path, encoding="latin1", nrows=5)
-    return list(df.columns)
+    return catalog.columns(csv_path)
+
+def describe_schema(csv_path="data.csv") -> str:
+    """One line per column: dtype, nulls, cardinality, range and examples."""
+    profile = catalog.get(csv_path)
+
+    lines = []
+    for column in profile["columns"]:
+        details = [column["dtype"], f"{column['nulls']} nulls", f"{column['unique']} distinct"]
+        if "min" in column:
+            details.append(f"range {column['min']} to {column['max']}")
+        if column["samples"]:
+            details.append("e.g. " + ", ".join(repr(value) for value in column["samples"]))
+        lines.append(f"- {column['name']}: " + "; ".join(details))
+
+    return f"{profile['rows']} rows.\n" + "\n".join(lines)
@@ -0,0 +1,82 @@
+"""
+Regression checks for the generated-code sandbox.
+
+    python -m pytest test_sandbox.py
+"""
+import importlib
+import os
+import types
+
+import pytest
+
+from code_analyzer import MODULE_ATTRIBUTES, analyze, validate_code
+from executor import execute_code, extract_python_code
+
+DATA_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.csv")
+
+ESCAPES = [
+    'import pandas as pd\npd.io.common.os.system("echo PWNED")\nresult_df = df.head(1)',
+    'import pandas\npandas.io.common.os.system("echo PWNED")',
+    'from pandas import io\nio.common.os.system("echo PWNED")',
+    'import matplotlib.pyplot as plt\nplt.matplotlib.cbook.os.system("echo PWNED")',
+    'result_df = df.__class__.__init__.__globals__',
+    'import os\nos.system("echo PWNED")',
+    'import matplotlib.pyplot as plt\nplt.cm.colors.np.ctypeslib.ctypes.CDLL(None).system("echo PWNED")',
+    'import matplotlib.pyplot as plt\nplt.style.core.os.system("echo PWNED")',
+]
+
+
+@pytest.mark.parametrize("code", ESCAPES)
+def test_validate_code_rejects_escape(code):
+    with pytest.raises(ValueError, match="Forbidden operation"):
+        validate_code(code)
+
+
+@pytest.mark.parametrize("code", [ESCAPES[0], ESCAPES[-2]])
+def test_execute_code_rejects_module_attribute_chain(code, capfd):
+    with pytest.raises(ValueError):
+        execute_code(code, DATA_CSV)
+    assert "PWNED" not in capfd.readouterr().out
+
+
+@pytest.mark.parametrize("module", sorted(MODULE_ATTRIBUTES))
+def test_allowlisted_attributes_are_not_modules(module):
+    # Attributes after a module-valued one would go unchecked
+    imported = importlib.import_module(module)
+    for name in MODULE_ATTRIBUTES[module]:
+        assert not isinstance(getattr(imported, name, None), types.ModuleType), name
+
+
+def test_execute_code_runs_allowed_pandas():
+    code = (
+        "import pandas as pd\n"
+        "totals = df.groupby('STATUS')['SALES'].sum()\n"
+        "result_df = pd.DataFrame({'STATUS': totals.index, 'SALES': totals.values})\n"
+    )
+    result = execute_code(code, DATA_CSV)
+    assert list(result["result_df"].columns) == ["STATUS", "SALES"]
+
+
+def test_extract_python_code_without_pandas_import():
+    answer = 'Totals:\n```python\nresult_df = df.groupby("TERRITORY")["SALES"].sum().reset_index()\n```\n'
+    assert extract_python_code(answer) == 'result_df = df.groupby("TERRITORY")["SALES"].sum().reset_index()'
+
+
+def test_execute_code_keeps_string_columns_as_strings():
+    code = (
+        "df['LABEL'] = df['COUNTRY'] + '-' + df['STATUS']\n"
+        "df.loc[df['STATUS'] != 'Shipped', 'STATUS'] = 'Other'\n"
+        "result_df = df[['LABEL', 'STATUS']].head()\n"
+    )
+    result = execute_code(code, DATA_CSV)
+    assert set(result["result_df"]["STATUS"]) <= {"Shipped", "Other"}
+
+
+def test_loop_over_aggregated_result_is_not_row_wise():
+    code = (
+        "result_df = df.groupby('STATUS')['SALES'].sum().reset_index()\n"
+        "for i in range(len(result_df)):\n"
+        "    print(result_df['STATUS'][i])\n"
+    )
+    assert analyze(code).cost == "vectorized"
+    assert analyze("for i in range(len(df)):\n    print(df['SALES'][i])").cost == "row-wise"
@@ -0,0 +1,268 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import queue
+import resource
+import shutil
+import tempfile
+import threading
+import time
+
+# Workers only ever render to files
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from catalog import catalog
+from executor import FIGURE_FILE, execute_code
+from tracing import span, tracer
+
+EXEC_WORKERS = int(os.getenv("EXEC_WORKERS", "2"))
+EXEC_TIMEOUT_S = float(os.getenv("EXEC_TIMEOUT_S", "30"))
+# Address space a job may add on top of the warmed-up worker; 0 = unlimited
+EXEC_MEMORY_MB = int(os.getenv("EXEC_MEMORY_MB", "2048"))
+# Workers are replaced after this many jobs, so leaks don't accumulate
+EXEC_MAX_JOBS = int(os.getenv("EXEC_MAX_JOBS", "100"))
+
+
+class ExecutionTimeout(TimeoutError):
+    pass
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+def _start_method():
+    # forkserver forks each worker from a server that already imported
+    # pandas, matplotlib and this module, so (re)starting one is cheap
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return "forkserver"
+    return "spawn"
+
+
+class WorkerPool:
+    """
+    Pre-started worker processes that run generated analysis code.
+
+    Each worker has pandas and matplotlib imported and the dataset loaded
+    before its first job, and runs in a private working directory so
+    concurrent jobs don't overwrite each other's output.png. A job gets
+    `timeout` seconds of wall-clock time, after which its worker is killed
+    and replaced, and `memory_mb` of address space on top of the warm
+    worker (RLIMIT_AS), beyond which allocations fail with MemoryError.
+    The result, captured stdout, figure bytes and the job's CPU time come
+    back over a pipe. At most `size` jobs run at once; others wait.
+    """
+
+    def __init__(self, size=EXEC_WORKERS, csv_path="data.csv", timeout=EXEC_TIMEOUT_S,
+                 memory_mb=EXEC_MEMORY_MB, max_jobs=EXEC_MAX_JOBS):
+        self.size = size
+        self.csv_path = os.path.abspath(csv_path)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_jobs = max_jobs
+        self.jobs = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self._context = multiprocessing.get_context(_start_method())
+        if self._context.get_start_method() == "forkserver":
+            self._context.set_forkserver_preload([__name__])
+        # Convert / profile the dataset once here rather than in every worker
+        if os.path.exists(self.csv_path):
+            catalog.get(self.csv_path)
+
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._start_worker())
+
+    def run(self, code: str) -> dict:
+        """
+        Execute `code` in a worker.
+
+        Returns {"result_df", "stdout", "figure", "cpu_s", "wall_s"};
+        exceptions raised by the code are re-raised here.
+        """
+        worker = self._idle.get()
+        try:
+            with span("sandbox.run", "tool", pid=worker.process.pid) as s:
+                result = worker.run(code, self.timeout)
+                s.set(cpu_s=result["cpu_s"], wall_s=result["wall_s"])
+        except ExecutionTimeout:
+            self.timeouts += 1
+            worker.kill()
+            raise
+        except WorkerCrashed:
+            self.crashes += 1
+            worker.kill()
+            raise
+        finally:
+            self.jobs += 1
+            if worker.alive() and worker.jobs < self.max_jobs:
+                self._idle.put(worker)
+            else:
+                worker.kill()
+                self._idle.put(self._start_worker())
+
+        if isinstance(result.get("error"), BaseException):
+            raise result["error"]
+        return result
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "idle": self._idle.qsize(),
+            "jobs": self.jobs,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+        }
+
+    def _start_worker(self):
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child, self.csv_path, self.memory_mb),
+            name="execute-code",
+            daemon=True
+        )
+        process.start()
+        child.close()
+        return _Worker(process, parent)
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+
+    def run(self, code, timeout):
+        self.jobs += 1
+        try:
+            self.conn.send(code)
+            # The first job also waits for the worker to finish warming up
+            ready = self.conn.poll(timeout)
+            if ready:
+                return self.conn.recv()
+        except (EOFError, OSError) as exc:
+            raise WorkerCrashed(f"Execution worker exited (code {self.process.exitcode})") from exc
+        raise ExecutionTimeout(f"Execution exceeded {timeout:g}s and was stopped")
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+def _worker_main(conn, csv_path, memory_mb):
+    # Warm up: the catalog memory-maps (or parses) the dataset once here
+    if os.path.exists(csv_path):
+        catalog.load(csv_path, columns=[])
+
+    # Spans still go to the shared JSONL file; the metrics file is the parent's
+    tracer.metrics_path = ""
+
+    if memory_mb:
+        _limit_memory(memory_mb)
+
+    workdir = tempfile.mkdtemp(prefix="execute-code-")
+    os.chdir(workdir)
+
+    try:
+        while True:
+            try:
+                code = conn.recv()
+            except EOFError:
+                return
+            result = _run_job(code, csv_path)
+            try:
+                conn.send(result)
+            except Exception as exc:
+                # Pickling failed before anything was written to the pipe
+                conn.send({**result, "result_df": None, "error": RuntimeError(f"Unpicklable result: {exc}")})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_job(code, csv_path):
+    stdout = io.StringIO()
+    start = time.perf_counter()
+    cpu_start = _cpu_time()
+    result = {"result_df": None, "error": None}
+
+    try:
+        with contextlib.redirect_stdout(stdout):
+            result.update(execute_code(code, csv_path))
+    except Exception as exc:
+        result["error"] = exc
+
+    result.update(
+        stdout=stdout.getvalue(),
+        figure=_take_figure(),
+        cpu_s=_cpu_time() - cpu_start,
+        wall_s=time.perf_counter() - start
+    )
+    return result
+
+
+def _take_figure():
+    """PNG bytes of the job's figure, saved or still open, and reset for the next job."""
+    figure = None
+    if os.path.exists(FIGURE_FILE):
+        with open(FIGURE_FILE, "rb") as f:
+            figure = f.read()
+        os.remove(FIGURE_FILE)
+    elif plt.get_fignums():
+        buffer = io.BytesIO()
+        plt.gcf().savefig(buffer, format="png")
+        figure = buffer.getvalue()
+
+    plt.close("all")
+    return figure
+
+
+def _limit_memory(memory_mb):
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            size_kib = next((int(line.split()[1]) for line in f if line.startswith("VmSize:")), None)
+    except OSError:
+        size_kib = None
+    if size_kib is None:
+        # Without /proc the baseline is unknown; don't guess a cap
+        return
+
+    limit = size_kib * 1024 + memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(csv_path="data.csv") -> WorkerPool:
+    """Process-wide pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool(csv_path=csv_path)
+        return _pool
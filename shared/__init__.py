@@ -0,0 +1,6 @@
+"""
+Modules used by every app: the pooled LLM client and the response cache.
+
+The apps run from their own directories, so each puts the repo root on
+sys.path before importing from here.
+"""
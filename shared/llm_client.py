@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "180"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Transient statuses worth retrying; Ollama answers 503 while loading a model
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class OllamaClient:
+    """
+    Pooled, concurrency-limited client for Ollama's /api/generate.
+
+    One keep-alive session is shared by every call, at most
+    `max_concurrency` requests are in flight at once (callers beyond that
+    wait), and connection errors or transient statuses are retried with
+    backoff. Per-call latency stats are appended to `call_stats`, which
+    every caller shares; pass `stats` to get a call's own.
+    """
+
+    def __init__(self, url, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES):
+        self.url = url
+        self.timeout = (LLM_CONNECT_TIMEOUT, timeout)
+        self.call_stats = deque(maxlen=100)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,  # don't re-send a prompt the server may still be generating
+            status=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def generate(self, model, prompt, options=None, stats=None) -> str:
+        return "".join(self.stream(model, prompt, options, stats)).strip()
+
+    def stream(self, model, prompt, options=None, stats=None):
+        """
+        Yield completion tokens from Ollama's NDJSON stream.
+
+        The call's latency stats are filled into the `stats` dict, if
+        given, once the stream finishes.
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": options or {}
+        }
+
+        with self._semaphore:
+            start = time.perf_counter()
+            response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=True)
+
+            if response.status_code != 200:
+                raise RuntimeError(f"Ollama error: {response.text}")
+
+            first_token_at = None
+            tokens = 0
+            final_chunk = {}
+
+            with response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise RuntimeError(f"Ollama error: {chunk['error']}")
+
+                    token = chunk.get("response", "")
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        tokens += 1
+                        yield token
+
+                    if chunk.get("done"):
+                        final_chunk = chunk
+                        break
+
+            call = self._record_stats(model, final_chunk, start, first_token_at, tokens)
+            if stats is not None:
+                stats.update(call)
+
+    async def agenerate(self, model, prompt, options=None) -> str:
+        return await asyncio.to_thread(self.generate, model, prompt, options)
+
+    async def agenerate_many(self, model, prompts, options=None):
+        """Run many prompts concurrently, bounded by `max_concurrency`."""
+        return await asyncio.gather(*(self.agenerate(model, p, options) for p in prompts))
+
+    def _record_stats(self, model, final_chunk, start, first_token_at, tokens):
+        end = time.perf_counter()
+
+        # Ollama reports its own generation timing in the final message
+        eval_count = final_chunk.get("eval_count", tokens)
+        eval_seconds = final_chunk.get("eval_duration", 0) / 1e9
+        if not eval_seconds and first_token_at is not None:
+            eval_seconds = end - first_token_at
+
+        call = {
+            "model": model,
+            "ttft_s": None if first_token_at is None else first_token_at - start,
+            "total_s": end - start,
+            "prompt_tokens": final_chunk.get("prompt_eval_count"),
+            "completion_tokens": eval_count,
+            "tokens_per_s": eval_count / eval_seconds if eval_seconds else None,
+        }
+        self.call_stats.append(call)
+        return call
+
+
+class GroqClient:
+    """
+    Shared, concurrency-limited wrapper around the Groq SDK.
+
+    The SDK client (which keeps its own pooled HTTP connections) is
+    created on first use rather than at import time, so importing an app
+    module never needs the API key or the network. As with OllamaClient,
+    `stats` receives a call's own latency and token counts.
+    """
+
+    def __init__(self, api_key=None, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.call_stats = deque(maxlen=100)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from groq import Groq
+
+                self._client = Groq(
+                    api_key=self.api_key or os.getenv("GROQ_API_KEY"),
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                )
+            return self._client
+
+    def chat(self, model, messages, temperature=0.2, stats=None, **kwargs) -> str:
+        with self._semaphore:
+            start = time.perf_counter()
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                **kwargs
+            )
+
+        usage = getattr(response, "usage", None)
+        call = {
+            "model": model,
+            "total_s": time.perf_counter() - start,
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+        }
+        self.call_stats.append(call)
+        if stats is not None:
+            stats.update(call)
+        return response.choices[0].message.content
+
+    async def achat(self, model, messages, temperature=0.2, stats=None, **kwargs) -> str:
+        return await asyncio.to_thread(self.chat, model, messages, temperature, stats, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(url) -> OllamaClient:
+    """Process-wide OllamaClient for `url`, so every caller shares one pool."""
+    with _clients_lock:
+        if ("ollama", url) not in _clients:
+            _clients[("ollama", url)] = OllamaClient(url)
+        return _clients[("ollama", url)]
+
+
+def get_groq_client(api_key=None) -> GroqClient:
+    """Process-wide GroqClient, one per API key."""
+    with _clients_lock:
+        if ("groq", api_key) not in _clients:
+            _clients[("groq", api_key)] = GroqClient(api_key)
+        return _clients[("groq", api_key)]
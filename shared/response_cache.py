@@ -0,0 +1,201 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(".response_cache", "responses.sqlite3"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+
+# Cosine similarity above which two questions count as the same question
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+
+
+class ResponseCache:
+    """
+    Persistent cache of LLM responses.
+
+    The exact tier is keyed by (model, temperature, prompt hash). The
+    optional semantic tier is used when a question embedding and a scope
+    (e.g. a document id) are given: a cached answer to a question within
+    `threshold` cosine similarity, for the same model, temperature and
+    scope, is reused. Entries expire after `ttl` seconds and the least
+    recently used are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl=RESPONSE_CACHE_TTL,
+                 max_entries=RESPONSE_CACHE_MAX_ENTRIES, threshold=RESPONSE_CACHE_SIMILARITY,
+                 enabled=RESPONSE_CACHE_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.enabled = enabled
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self._db = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model, temperature, prompt) -> str:
+        return hashlib.sha256(f"{model}\0{temperature}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, model, temperature, prompt, scope=None, vector=None):
+        """Cached response for `prompt`, else for a similar question in `scope`, else None."""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self.db.execute(
+                "SELECT response, created FROM responses WHERE key = ?",
+                (self.key(model, temperature, prompt),)
+            ).fetchone()
+
+            if row is not None and now - row[1] <= self.ttl:
+                self._touch(self.key(model, temperature, prompt), now)
+                self.hits["exact"] += 1
+                return row[0]
+
+            if scope is not None and vector is not None:
+                response = self._similar(model, temperature, scope, vector, now)
+                if response is not None:
+                    self.hits["semantic"] += 1
+                    return response
+
+            self.misses += 1
+            return None
+
+    def put(self, model, temperature, prompt, response, scope=None, vector=None):
+        if not self.enabled or not response:
+            return
+
+        blob = None
+        if vector is not None:
+            blob = _normalize(vector).tobytes()
+
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(model, temperature, prompt), model, float(temperature),
+                 None if scope is None else str(scope), blob, response, now, now)
+            )
+            self._evict(now)
+            self.db.commit()
+
+    def cached(self, model, temperature, prompt, generate_fn, scope=None, vector=None) -> str:
+        """Return the cached response, or call `generate_fn()` and cache its result."""
+        response = self.get(model, temperature, prompt, scope, vector)
+        if response is None:
+            response = generate_fn()
+            self.put(model, temperature, prompt, response, scope, vector)
+        return response
+
+    def cached_stream(self, model, temperature, prompt, stream_fn, scope=None, vector=None):
+        """
+        Streaming variant of cached(): a hit is yielded as a single token,
+        a miss streams `stream_fn()` through and is cached once complete.
+        """
+        response = self.get(model, temperature, prompt, scope, vector)
+        if response is not None:
+            yield response
+            return
+
+        tokens = []
+        for token in stream_fn():
+            tokens.append(token)
+            yield token
+
+        self.put(model, temperature, prompt, "".join(tokens).strip(), scope, vector)
+
+    def stats(self) -> dict:
+        hits = self.hits["exact"] + self.hits["semantic"]
+        lookups = hits + self.misses
+        with self._lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.enabled else 0
+        return {
+            "hits": hits,
+            "exact_hits": self.hits["exact"],
+            "semantic_hits": self.hits["semantic"],
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        with self._lock:
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
+            self.hits = {"exact": 0, "semantic": 0}
+            self.misses = 0
+
+    @property
+    def db(self):
+        # Opened on first use so importing an app never touches the disk
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    temperature REAL,
+                    scope TEXT,
+                    vector BLOB,
+                    response TEXT,
+                    created REAL,
+                    used REAL
+                )"""
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_scope ON responses (model, temperature, scope)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _similar(self, model, temperature, scope, vector, now):
+        rows = self.db.execute(
+            """SELECT key, vector, response FROM responses
+               WHERE model = ? AND temperature = ? AND scope = ?
+                 AND vector IS NOT NULL AND created >= ?""",
+            (model, float(temperature), str(scope), now - self.ttl)
+        ).fetchall()
+        if not rows:
+            return None
+
+        query = _normalize(vector)
+        cached = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        if cached.shape[1] != query.shape[0]:
+            return None
+
+        similarities = cached @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+
+        self._touch(rows[best][0], now)
+        return rows[best][2]
+
+    def _touch(self, key, now):
+        self.db.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+        self.db.commit()
+
+    def _evict(self, now):
+        self.db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        overflow = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used LIMIT ?)",
+                (overflow,)
+            )
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector